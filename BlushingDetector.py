@@ -11,6 +11,8 @@ class BlushingDetector:
     GREEN_CHANGE_ALLOWANCE = 100
     BLUE_CHANGE_ALLOWANCE = 80
     RGB_CHANGE_ALLOWANCE = 60
+    # frames without blushing don't reset the counter once it reached this many blushing frames
+    BLUSHING_TOLERATED_FRAMES = 20
 
     def __init__(self, blushing_consecutive_frames=50):
         # counter of frames in which blushing occurred
@@ -21,16 +23,22 @@ class BlushingDetector:
         self.AVERAGE_CHEEK_COLOR = [0, 0, 0]
 
         self.blushing_occurred_counter = 0
+        # average cheek color of the last inspected frame, and whether blushing was detected in it
+        self.last_cheeks_color = None
+        self.blushing_detected = False
 
-    def detect(self, frame, gray_frame, face_region):
-        # extract the right and left cheek coordinates, then use the
-        # coordinates to compute the average cheeks color
-        right_cheek = face_region[self.right_cheek_idx]
-        left_cheek = face_region[self.left_cheek_idx]
-
-        self.draw_cheeks(frame, right_cheek, left_cheek)
+        # reusable memory for the cheek masks, grown when a bigger face shows up
+        self.mask_buffer = numpy.zeros(0, numpy.uint8)
 
-        cheeks_color = self.calculate_cheeks_color(frame, gray_frame, right_cheek, left_cheek)
+    def detect(self, frame, face_region, cheeks_color=None):
+        # extract the right and left cheek coordinates, then use the
+        # coordinates to compute the average cheeks color, unless it was computed already
+        if cheeks_color is None:
+            right_cheek = face_region[self.right_cheek_idx]
+            left_cheek = face_region[self.left_cheek_idx]
+            cheeks_color = self.calculate_cheeks_color(frame, right_cheek, left_cheek)
+        self.last_cheeks_color = cheeks_color
+        self.blushing_detected = False
 
         # check to see if the blushing occurred, and if so, increment the frame counter
         blushing = self.is_blushing(cheeks_color)
@@ -40,7 +48,7 @@ class BlushingDetector:
 
         # if the blushing continued for a sufficient number of frames
         if self.blushing_frame_counter >= self.BLUSHING_CONSECUTIVE_FRAMES:
-            self.print_blushing(frame)
+            self.blushing_detected = True
             print("BLUSHING")
             # reset the blushing frame counter
             self.blushing_frame_counter = 0
@@ -48,10 +56,12 @@ class BlushingDetector:
 
         # if blushing is not detected in the current frame, but is detected in 20 previous ones,
         # the counter shouldn't reset because this may occur due to sudden movement, or lighting change
-        elif not blushing and self.blushing_frame_counter < 20:
+        elif not blushing and self.blushing_frame_counter < self.BLUSHING_TOLERATED_FRAMES:
             # reset the blushing frame counter
             self.blushing_frame_counter = 0
 
+        return self.blushing_detected
+
     def is_blushing(self, temp_color):
         # compute the change in red, green and blue aspects between new and average cheek color
         red_change = abs(temp_color[2] - self.AVERAGE_CHEEK_COLOR[2])
@@ -75,43 +85,40 @@ class BlushingDetector:
         self.blushing_frame_counter = 0
         return retVal
 
-    @staticmethod
-    def calculate_cheeks_color(frame, gray_frame, right_cheek, left_cheek):
-        extracted_cheeks_frame = numpy.zeros(frame.shape, numpy.uint8)
-
-        # crate mask for calculating right cheek color
-        mask = numpy.zeros(gray_frame.shape, numpy.uint8)
-        cv2.drawContours(mask, [right_cheek], -1, 255, -1)
-        # calculate average color
-        right_cheek_color = cv2.mean(frame, mask)
-        cv2.drawContours(extracted_cheeks_frame, [right_cheek], -1, right_cheek_color, -1)
+    def calculate_cheeks_color(self, frame, right_cheek, left_cheek):
+        right_cheek_color, left_cheek_color = self.calculate_each_cheek_color(frame, right_cheek, left_cheek)
 
-        # crate mask for calculating left cheek color
-        mask = numpy.zeros(gray_frame.shape, numpy.uint8)
-        cv2.drawContours(mask, [left_cheek], -1, 255, -1)
-        # calculate average color
-        leftCheekColor = cv2.mean(frame, mask)
-        cv2.drawContours(extracted_cheeks_frame, [left_cheek], -1, leftCheekColor, -1)
-
-        average_cheek_color = [(leftCheekColor[0] + right_cheek_color[0]) / 2,
-                               (leftCheekColor[1] + right_cheek_color[1]) / 2,
-                               (leftCheekColor[2] + right_cheek_color[2]) / 2]
-
-        cv2.putText(extracted_cheeks_frame, "BGR: {:.0f}".format(average_cheek_color[0])
-                    + " {:.0f}".format(average_cheek_color[1])
-                    + " {:.0f}".format(average_cheek_color[2]), (150, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-
-        cv2.imshow('Cheeks', extracted_cheeks_frame)
+        average_cheek_color = [(left_cheek_color[0] + right_cheek_color[0]) / 2,
+                               (left_cheek_color[1] + right_cheek_color[1]) / 2,
+                               (left_cheek_color[2] + right_cheek_color[2]) / 2]
 
         return average_cheek_color
 
-    @staticmethod
-    def draw_cheeks(frame, left_cheek, right_cheek):
-        cv2.drawContours(frame, [right_cheek], -1, (255, 0, 0))
-        cv2.drawContours(frame, [left_cheek], -1, (200, 0, 0))
-
-    @staticmethod
-    def print_blushing(frame):
-        cv2.putText(frame, "BLUSHING", (150, 300),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    def calculate_each_cheek_color(self, frame, right_cheek, left_cheek):
+        # the average color of each cheek is computed only over the cheek's bounding rectangle,
+        # with a mask drawn into reusable memory instead of two new full frame masks
+        frame_height, frame_width = frame.shape[:2]
+        cheek_colors = []
+        for cheek in (right_cheek, left_cheek):
+            x, y, width, height = cv2.boundingRect(cheek)
+            left, top = max(x, 0), max(y, 0)
+            right, bottom = min(x + width, frame_width), min(y + height, frame_height)
+            if right <= left or bottom <= top:
+                # the cheek is outside of the frame
+                cheek_colors.append((0.0, 0.0, 0.0, 0.0))
+                continue
+
+            mask = self.get_mask(bottom - top, right - left)
+            cv2.drawContours(mask, [cheek], -1, 255, -1, offset=(-left, -top))
+            # calculate average color
+            cheek_colors.append(cv2.mean(frame[top:bottom, left:right], mask))
+
+        return cheek_colors
+
+    def get_mask(self, height, width):
+        # returns a zeroed, contiguous height x width mask backed by the reusable buffer
+        if self.mask_buffer.size < height * width:
+            self.mask_buffer = numpy.zeros(height * width * 2, numpy.uint8)
+        mask = self.mask_buffer[:height * width].reshape(height, width)
+        mask.fill(0)
+        return mask
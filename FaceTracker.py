@@ -0,0 +1,265 @@
+import collections
+
+import cv2
+import dlib
+
+# ways of following the face between two detections
+TRACKING_MODES = ("landmarks", "correlation")
+
+
+class FaceTracker:
+    # Runs the (expensive) HOG face detector only every detection_interval frames, or sooner when tracking
+    # becomes unreliable. In between the face box is followed either from the previous frame's landmarks or
+    # with dlib's correlation tracker, and passed straight to the shape predictor.
+
+    def __init__(self, detector, detection_interval=1, mode="landmarks", min_overlap=0.5, min_confidence=7.0,
+                 detection_scale=1.0):
+        if mode not in TRACKING_MODES:
+            raise ValueError("Unknown tracking mode '" + mode + "', expected one of " + repr(TRACKING_MODES))
+        self.detector = detector
+        # number of frames a detected face is followed before detecting it again (1 detects on every frame)
+        self.detection_interval = detection_interval
+        self.mode = mode
+        # landmarks mode re-detects when the landmark box of two consecutive frames overlaps less than this
+        self.min_overlap = min_overlap
+        # correlation mode re-detects when the tracker's peak to side lobe ratio falls below this
+        self.min_confidence = min_confidence
+        # the detector runs on a copy of the frame this many times smaller; the HOG detector doesn't find faces
+        # smaller than 80x80 pixels, so faces must be at least 80 * detection_scale pixels in the full frame
+        self.detection_scale = detection_scale
+
+        self.face = None
+        self.frames_since_detection = 0
+        self.needs_detection = True
+        # position and size of the detector's box relative to the bounding box of the landmarks
+        self.box_to_landmarks = None
+        self.landmarks_box = None
+        self.correlation_tracker = None
+
+        self.detections = 0
+        self.frames = 0
+
+    def locate(self, gray_frame):
+        # returns the face box in this frame, or None if there is no face
+        self.frames += 1
+        self.frames_since_detection += 1
+
+        if self.needs_detection or self.face is None or self.frames_since_detection >= self.detection_interval:
+            return self.detect(gray_frame)
+
+        face = self.follow(gray_frame)
+        if face is None:
+            return self.detect(gray_frame)
+        return face
+
+    def follow(self, gray_frame):
+        # the face box in this frame without detecting it, or None when it can't be followed reliably
+        if self.mode == "correlation":
+            confidence = self.correlation_tracker.update(gray_frame)
+            if confidence < self.min_confidence:
+                self.needs_detection = True
+                return None
+            self.face = self.to_rectangle(self.correlation_tracker.get_position())
+
+        return self.face
+
+    def detect(self, gray_frame):
+        self.detections += 1
+        self.frames_since_detection = 0
+        self.needs_detection = False
+        self.box_to_landmarks = None
+
+        faces = self.detect_faces(gray_frame)
+        if not faces:
+            self.face = None
+            return None
+
+        return self.track(gray_frame, faces[0])
+
+    def track(self, gray_frame, face):
+        # start following a face that was just detected
+        self.face = face
+        self.frames_since_detection = 0
+        self.needs_detection = False
+        self.box_to_landmarks = None
+        if self.mode == "correlation":
+            self.correlation_tracker = dlib.correlation_tracker()
+            self.correlation_tracker.start_track(gray_frame, self.face)
+        return self.face
+
+    def detect_faces(self, gray_frame):
+        # runs the detector, on a downscaled copy of the frame if configured, and returns the face boxes
+        # in full resolution coordinates, so landmarks are still predicted on the full resolution frame
+        if self.detection_scale <= 1:
+            return [face for face in self.detector(gray_frame, 0) if face]
+
+        height, width = gray_frame.shape[:2]
+        small_frame = cv2.resize(gray_frame, (int(width / self.detection_scale), int(height / self.detection_scale)),
+                                 interpolation=cv2.INTER_AREA)
+        return [self.scale_rectangle(face, self.detection_scale) for face in self.detector(small_frame, 0) if face]
+
+    def update(self, face_region):
+        # follow the face with the landmarks found in the box returned by locate
+        if self.face is None:
+            return
+
+        left, top = face_region.min(axis=0)
+        right, bottom = face_region.max(axis=0)
+        width, height = max(right - left, 1), max(bottom - top, 1)
+        landmarks_box = (left, top, right, bottom)
+
+        # landmarks jumping between frames mean the face moved faster than the box follows it
+        if self.landmarks_box is not None and self.overlap(self.landmarks_box, landmarks_box) < self.min_overlap:
+            self.needs_detection = True
+        self.landmarks_box = landmarks_box
+
+        if self.mode != "landmarks":
+            return
+
+        if self.box_to_landmarks is None:
+            # right after a detection, remember where the detector puts its box around these landmarks
+            self.box_to_landmarks = ((self.face.left() - left) / width, (self.face.top() - top) / height,
+                                     self.face.width() / width, self.face.height() / height)
+
+        x, y, scale_x, scale_y = self.box_to_landmarks
+        face_left = left + x * width
+        face_top = top + y * height
+        self.face = dlib.rectangle(int(round(face_left)), int(round(face_top)),
+                                   int(round(face_left + scale_x * width)), int(round(face_top + scale_y * height)))
+
+    def reset(self):
+        self.face = None
+        self.needs_detection = True
+        self.landmarks_box = None
+
+    @staticmethod
+    def overlap(box, other):
+        # intersection over union of two (left, top, right, bottom) boxes
+        width = min(box[2], other[2]) - max(box[0], other[0])
+        height = min(box[3], other[3]) - max(box[1], other[1])
+        if width <= 0 or height <= 0:
+            return 0.0
+        intersection = width * height
+        union = (box[2] - box[0]) * (box[3] - box[1]) + (other[2] - other[0]) * (other[3] - other[1]) - intersection
+        return intersection / float(union)
+
+    @staticmethod
+    def scale_rectangle(rectangle, scale):
+        return dlib.rectangle(int(round(rectangle.left() * scale)), int(round(rectangle.top() * scale)),
+                              int(round(rectangle.right() * scale)), int(round(rectangle.bottom() * scale)))
+
+    @staticmethod
+    def to_rectangle(position):
+        return dlib.rectangle(int(round(position.left())), int(round(position.top())),
+                              int(round(position.right())), int(round(position.bottom())))
+
+
+class MultiFaceTracker:
+    # Follows every face in the frame, each under an identity that stays the same from frame to frame.
+    # All faces are detected with one detector pass; in between detections each face is followed by its own
+    # FaceTracker. Detected faces are matched to the known ones by the overlap of their boxes, a face that isn't
+    # matched gets a new identity, and a known face that isn't detected max_missed_detections times in a row is
+    # forgotten.
+
+    def __init__(self, detector, detection_interval=1, mode="landmarks", min_overlap=0.5, min_confidence=7.0,
+                 detection_scale=1.0, max_faces=None, max_missed_detections=2, min_identity_overlap=0.3):
+        # runs the detector (on the downscaled frame) for all faces
+        self.face_detector = FaceTracker(detector, detection_interval, mode, min_overlap, min_confidence,
+                                         detection_scale)
+        self.detection_interval = detection_interval
+        self.max_faces = max_faces
+        self.max_missed_detections = max_missed_detections
+        # a detected box overlapping a known face at least this much is that face
+        self.min_identity_overlap = min_identity_overlap
+
+        self.tracks = collections.OrderedDict()
+        self.missed_detections = {}
+        # identities forgotten since the caller last took them
+        self.forgotten = []
+        self.next_identity = 0
+        self.frames_since_detection = 0
+
+        self.detections = 0
+        self.frames = 0
+
+    def locate(self, gray_frame):
+        # returns (identity, face box) of every face in this frame
+        self.frames += 1
+        self.frames_since_detection += 1
+
+        visible = [(identity, track) for identity, track in self.tracks.items()
+                   if self.missed_detections[identity] == 0]
+        if not visible or self.frames_since_detection >= self.detection_interval or \
+                any(track.needs_detection or track.face is None for _, track in visible):
+            return self.detect(gray_frame)
+
+        faces = []
+        for identity, track in visible:
+            face = track.follow(gray_frame)
+            if face is None:
+                return self.detect(gray_frame)
+            faces.append((identity, face))
+        return faces
+
+    def detect(self, gray_frame):
+        self.detections += 1
+        self.frames_since_detection = 0
+
+        boxes = self.face_detector.detect_faces(gray_frame)
+        if self.max_faces is not None:
+            boxes = boxes[:self.max_faces]
+
+        # match the most overlapping pairs of a detected box and a known face first
+        pairs = []
+        for box_index, box in enumerate(boxes):
+            for identity, track in self.tracks.items():
+                if track.face is not None:
+                    overlap = FaceTracker.overlap(self.to_box(box), self.to_box(track.face))
+                    if overlap >= self.min_identity_overlap:
+                        pairs.append((overlap, box_index, identity))
+        pairs.sort(key=lambda pair: -pair[0])
+
+        identities = {}
+        for _, box_index, identity in pairs:
+            if box_index not in identities and identity not in identities.values():
+                identities[box_index] = identity
+
+        for identity in list(self.tracks):
+            if identity in identities.values():
+                self.missed_detections[identity] = 0
+            else:
+                self.missed_detections[identity] += 1
+                if self.missed_detections[identity] > self.max_missed_detections:
+                    del self.tracks[identity]
+                    del self.missed_detections[identity]
+                    self.forgotten.append(identity)
+
+        faces = []
+        for box_index, box in enumerate(boxes):
+            identity = identities.get(box_index)
+            if identity is None:
+                identity = self.next_identity
+                self.next_identity += 1
+                self.tracks[identity] = FaceTracker(self.face_detector.detector, self.detection_interval,
+                                                    self.face_detector.mode, self.face_detector.min_overlap,
+                                                    self.face_detector.min_confidence)
+                self.missed_detections[identity] = 0
+            faces.append((identity, self.tracks[identity].track(gray_frame, box)))
+        return sorted(faces, key=lambda face: face[0])
+
+    def update(self, identity, face_region):
+        self.tracks[identity].update(face_region)
+
+    def take_forgotten(self):
+        # identities forgotten since the last call
+        forgotten, self.forgotten = self.forgotten, []
+        return forgotten
+
+    def reset(self):
+        self.forgotten.extend(self.tracks)
+        self.tracks.clear()
+        self.missed_detections.clear()
+
+    @staticmethod
+    def to_box(rectangle):
+        return rectangle.left(), rectangle.top(), rectangle.right(), rectangle.bottom()
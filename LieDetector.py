@@ -1,221 +1,540 @@
+import collections
+import os
+import threading
 import time
 
 import cv2
 import dlib
 import imutils
+import numpy
 from imutils import face_utils
 from imutils.video import VideoStream, FileVideoStream
-import numpy as np
 
-import BlinkDetector
-import BlushingDetector
-import Person
-import PursedLipsDetector
-import kNN
+import FaceTracker
+import Profiler
+import ReportWriter
+import StreamingScorer
+import Subject
+import Visualizer
 import feedforward_nn
+import kNN
+import landmark_cache
+import landmark_geometry
+import prediction
 
 SHAPE_PREDICTOR_PATH = "shape_predictor_68_face_landmarks.dat"
 FILE_VIDEO_STREAM_PATH = "../dataset/03.mp4"
 DATASET_PATH = 'files/datasetExtracted.csv'
+REPORT_PATH = "report.jsonl"
 
 NUMBER_OF_FRAMES_TO_INSPECT = 200
 NUMBER_OF_FRAMES_TO_INSPECT_EYES = 25
 
+# process-wide landmark predictors, keyed by their path. The (100 MB) predictor is only read while predicting,
+# so every LieDetector of a process (e.g. every stream of a SessionServer) shares one copy
+_shape_predictors = {}
+_shape_predictors_lock = threading.Lock()
+
+# dlib's HOG face detector can't be used by several threads at once, so every thread gets its own (it's small)
+_face_detectors = threading.local()
+
+
+def get_shape_predictor(shape_predictor_path=SHAPE_PREDICTOR_PATH):
+    # return dlib's facial landmark predictor, reloading it only if it changed on disk
+    key = os.path.abspath(shape_predictor_path)
+    mtime = os.path.getmtime(shape_predictor_path)
+    with _shape_predictors_lock:
+        cached = _shape_predictors.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        predictor = dlib.shape_predictor(shape_predictor_path)
+        _shape_predictors[key] = (mtime, predictor)
+        return predictor
+
+
+def detect_faces(image, upsample=0):
+    # runs the calling thread's HOG face detector on the image, creating it on the thread's first call
+    detector = getattr(_face_detectors, "detector", None)
+    if detector is None:
+        detector = _face_detectors.detector = dlib.get_frontal_face_detector()
+    return detector(image, upsample)
+
 
 class LieDetector:
 
-    def __init__(self, algorithm):
+    def __init__(self, algorithm, video_path=None, question_times=None, display=True, report_path=REPORT_PATH,
+                 detection_interval=1, tracking="landmarks", detection_scale=1.0, landmark_cache_directory=None,
+                 cached_frames=None, frames_to_inspect=NUMBER_OF_FRAMES_TO_INSPECT,
+                 frames_to_inspect_eyes=NUMBER_OF_FRAMES_TO_INSPECT_EYES, profiler=None, max_faces=1, camera=0,
+                 baseline_half_life=None, score_every=None, score_window=10.0, on_score=None):
+        # "knn" or "ffnn", or None to only collect the features of every question without predicting
         self.algorithm = algorithm
+        # the person's averages are measured over the first frames_to_inspect frames,
+        # their eye and lips aspect ratios over the first frames_to_inspect_eyes of them
+        self.frames_to_inspect = frames_to_inspect
+        self.frames_to_inspect_eyes = frames_to_inspect_eyes
+        # the baseline averages forget older frames with this half-life (in frames), None averages all of them
+        self.baseline_half_life = baseline_half_life
+        # the face detector runs every detection_interval frames, in between the face is tracked
+        self.detection_interval = detection_interval
+        self.tracking = tracking
+        # faces are detected on a frame this many times smaller, landmarks still on the full frame
+        self.detection_scale = detection_scale
+        # number of faces analysed in every frame, each with its own baseline and detectors;
+        # None analyses every face found
+        self.max_faces = max_faces
+        self.multiple_faces = max_faces != 1
+        if self.multiple_faces and (landmark_cache_directory is not None or cached_frames is not None):
+            raise ValueError("landmark caches hold a single face, they can't be used with max_faces "
+                             + str(max_faces))
+        # video file (or stream url) to analyse instead of the camera with index camera, and the times
+        # (in seconds from the start of the video) at which its questions end, in place of the "n" key
+        self.video_path = video_path
+        self.camera = camera
+        self.question_times = sorted(question_times or [])
+        # without a display nothing is drawn, no windows are opened and no keys are read,
+        # e.g. for batch processing on a server
+        self.display = display
+        self.visualizer = Visualizer.Visualizer() if display else None
+        # times every stage of the frame loop; the null profiler records nothing
+        self.profiler = profiler if profiler is not None else Profiler.NullProfiler()
+        # report of every question, as JSON Lines or (for .txt files) the legacy text, or None to only collect
+        # the results; it's written by a background thread, started once everything else is loaded
+        self.report_path = report_path
+        self.report_writer = None
+        # directory of landmark caches: a video analysed before is replayed from its cache instead of being
+        # decoded again, otherwise its landmarks are saved there. None analyses every video from its frames
+        self.landmark_cache_directory = landmark_cache_directory
+        # records of a landmark cache loaded already, replayed instead of opening a video
+        self.cached_frames = cached_frames
+        self.landmark_recorder = None
+        self.results = []
+        # with score_every, every subject is also predicted every score_every frames from the events of the last
+        # score_window seconds, and each score is passed to on_score (see scores)
+        self.scorer = None
+        if score_every is not None:
+            self.scorer = StreamingScorer.StreamingScorer(self, score_window, score_every, on_score,
+                                                          data_set_path=DATASET_PATH)
+        # the features every question was (or would have been) predicted from
+        self.question_features = []
         self.initialize()
         self.frame_counter = 0
-        self.blink_detector = BlinkDetector.BlinkDetector()
-        self.pursed_lips_detector = PursedLipsDetector.PursedLipsDetector()
-        self.blushing_detector = BlushingDetector.BlushingDetector()
-        self.person = Person.Person()
+        self.timestamp = None
+        # every face followed, by identity; the first one is analysed even before a face is found
+        self.primary_subject = Subject.Subject(0, self)
+        self.subjects = collections.OrderedDict([(self.primary_subject.identity, self.primary_subject)])
         self.questions_counter = 1
         self.seconds = 0
 
-    def initialize(self):
-        # initialize dlib's face detector (HOG-based) and then create
-        # the facial landmark predictor
-        self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor(SHAPE_PREDICTOR_PATH)
+        # load the model once up front so the first question doesn't stall the capture loop
+        if self.algorithm == "ffnn":
+            feedforward_nn.get_model()
+        elif self.algorithm is not None:
+            kNN.get_model(DATASET_PATH)
 
-        # self.video_stream = FileVideoStream(FILE_VIDEO_STREAM_PATH).start()
-        # self.file_stream = True
-        self.video_stream = VideoStream(src=0).start()
-        self.file_stream = False
-        time.sleep(1.0)
+        # started last, so a video or model that fails to load doesn't leave its thread and file open
+        if report_path is not None:
+            self.report_writer = ReportWriter.ReportWriter(
+                report_path, ReportWriter.get_formatter(report_path, name_faces=self.multiple_faces))
 
-    def process(self):
+    # the primary subject's person and detectors, the only ones when a single face is analysed
+    @property
+    def person(self):
+        return self.primary_subject.person
 
-        timeBefore = time.time()
-        # loop over frames from the video stream
-        while True:
-
-            # if this is a file video stream, check if there are any more frames left in the buffer to process
-            if self.file_stream and not self.video_stream.more():
-                break
-
-            # get the frame from the threaded video file stream, resize it, and convert it to grayscale
-            frame = self.video_stream.read()
-            frame = imutils.resize(frame, width=800)
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            self.frame_counter += 1
-
-            # detect faces in the grayscale frame
-            faces = self.detector(gray_frame, 0)
-
-            if faces and faces[0]:
-                face = faces[0]
-                # determine the facial landmarks for the face region, then
-                # convert the facial landmark (x, y)-coordinates to a NumPy array
-                face_region = self.predictor(gray_frame, face)
-                face_region = face_utils.shape_to_np(face_region)
-
-                # inspect face and calculate average values of interest
-                if self.frame_counter < NUMBER_OF_FRAMES_TO_INSPECT:
-
-                    if self.frame_counter < NUMBER_OF_FRAMES_TO_INSPECT_EYES:
-                        # calculate average eye and lips aspect ratio through the first couple of frames
-                        self.calculate_eye_aspect_ratio(face_region)
-                        self.calculate_lips_aspect_ratio(face_region)
-
-                    elif self.frame_counter < NUMBER_OF_FRAMES_TO_INSPECT_EYES + 3:
-                        # calculate eye and lips aspect ratio threshold value
-                        # depending on which blink detector will detect blinks
-                        self.blink_detector.calculate_eye_aspect_ratio_threshold(self.person.eye_aspect_ratio)
-                        self.pursed_lips_detector.calculate_lips_aspect_ratio_threshold(self.person.lips_aspect_ratio)
-                    else:
-                        # calculate average number of blinks and lip pursing
-                        self.blink_detector.detect(frame, face_region)
-                        self.pursed_lips_detector.detect(frame, face_region)
-
-                    # calculate average cheek color
-                    self.calculate_average_cheek_color(frame, gray_frame, face_region)
-
-                elif self.frame_counter == NUMBER_OF_FRAMES_TO_INSPECT:
-                    print("SET AVERAGE VALUES")
-                    # set values of interest to the respective detectors
-                    self.blushing_detector.set_average_cheek_color(self.person.average_cheek_color)
-
-                    now = time.time()
-                    # set average number of blinks and lip pursing to the person
-                    self.person.set_average_number_of_blinks(self.blink_detector.get_and_reset_number_of_blinks(),
-                                                             now - timeBefore)
-                    self.person.set_average_number_of_lip_pursing(
-                        self.pursed_lips_detector.get_and_reset_number_of_lip_pursing())
-                    print(self.person.average_cheek_color)
-                    print(self.person.average_number_of_blinks)
-                    print(self.person.average_number_of_lip_pursing)
-
-                # detect blinks, lip pursing and blushing
-                else:
-                    self.blink_detector.detect(frame, face_region)
-                    self.pursed_lips_detector.detect(frame, face_region)
-                    self.blushing_detector.detect(frame, gray_frame, face_region)
-
-                cv2.putText(frame, "A_EAR: {:.4f}".format(self.person.eye_aspect_ratio), (200, 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                cv2.putText(frame, "A_LAR: {:.4f}".format(self.person.lips_aspect_ratio), (500, 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-
-            # show the frame
-            cv2.imshow("Lie detector", frame)
-
-            key = cv2.waitKey(1) & 0xFF
-
-            if key == ord("x"):
-                break
-
-            elif key == ord("n"):
-
-                # calculate number of seconds
-                now = time.time()
-                self.seconds = now - timeBefore
-                self.detect_if_lie()
-
-                self.questions_counter += 1
-                timeBefore = time.time()
-
-        now = time.time()
-        self.seconds = now - timeBefore
-        self.detect_if_lie()
+    @property
+    def blink_detector(self):
+        return self.primary_subject.blink_detector
 
-    def calculate_average_cheek_color(self, frame, gray_frame, face_region):
-        left_cheek = face_region[self.blushing_detector.left_cheek_idx]
-        right_cheek = face_region[self.blushing_detector.right_cheek_idx]
-        calculated_cheek_color = self.blushing_detector.calculate_cheeks_color(frame, gray_frame, right_cheek,
-                                                                               left_cheek)
-        self.person.calculate_average_color(calculated_cheek_color)
+    @property
+    def pursed_lips_detector(self):
+        return self.primary_subject.pursed_lips_detector
 
-    def calculate_eye_aspect_ratio(self, face_region):
-        EAR, left_eye, right_eye = self.blink_detector.calculate_eye_aspect_ratio(face_region)
-        self.person.calculate_average_eye_aspect_ratio(EAR)
+    @property
+    def blushing_detector(self):
+        return self.primary_subject.blushing_detector
 
-    def calculate_lips_aspect_ratio(self, face_region):
-        LAR, mouth = self.pursed_lips_detector.lips_aspect_ratio(face_region, consider_smile=False)
-        self.person.calculate_average_lips_aspect_ratio(LAR)
-
-    def detect_if_lie(self):
-        # get detected features
-        number_of_blinks = self.blink_detector.get_and_reset_number_of_blinks()
-        number_of_blushing_occurred = self.blushing_detector.get_number_of_blushing_occurred_and_reset()
-        number_of_lip_pursing_occurred = self.pursed_lips_detector.get_and_reset_number_of_lip_pursing()
-
-        if self.seconds > 0:
-            number_of_blinks_per_second = number_of_blinks / self.seconds
+    def initialize(self):
+        if self.cached_frames is not None:
+            self.replay_cached_frames()
+            return
+
+        if self.video_path is not None and self.landmark_cache_directory is not None:
+            cache_path = landmark_cache.get_cache_path(self.video_path, self.detection_interval, self.tracking,
+                                                       self.detection_scale, self.landmark_cache_directory)
+            if os.path.exists(cache_path):
+                self.cached_frames = landmark_cache.load(cache_path)
+                self.replay_cached_frames()
+                print("[INFO] Replaying landmarks from " + cache_path)
+                return
+            self.landmark_recorder = landmark_cache.LandmarkRecorder(cache_path)
+
+        # the face detector of whichever thread analyses the frame, and the shared landmark predictor
+        self.detector = detect_faces
+        self.predictor = get_shape_predictor()
+        if self.multiple_faces:
+            self.face_tracker = FaceTracker.MultiFaceTracker(self.detector, self.detection_interval, self.tracking,
+                                                             detection_scale=self.detection_scale,
+                                                             max_faces=self.max_faces)
+        else:
+            self.face_tracker = FaceTracker.FaceTracker(self.detector, self.detection_interval, self.tracking,
+                                                        detection_scale=self.detection_scale)
+
+        if self.video_path is not None:
+            self.video_stream = FileVideoStream(self.video_path).start()
+            self.file_stream = True
+            # time of file streams is measured in video time, so it doesn't depend on processing speed
+            self.fps = self.video_stream.stream.get(cv2.CAP_PROP_FPS) or 30.0
         else:
-            number_of_blinks_per_second = number_of_blinks
+            self.video_stream = VideoStream(src=self.camera).start()
+            self.file_stream = False
+            time.sleep(1.0)
+
+    def replay_cached_frames(self):
+        # everything the frames are needed for is in the cache, so neither a video nor dlib is opened
+        self.file_stream = True
+        self.video_stream = None
+        self.face_tracker = None
+
+    def now(self):
+        # time of the frame being analysed: seconds since the start of the video for file streams,
+        # and the wall clock time the frame was captured at for the webcam
+        if self.timestamp is not None:
+            return self.timestamp
+        if self.file_stream:
+            return 0.0
+        return time.time()
 
-        to_predict = [self.person.average_number_of_blinks, number_of_blinks_per_second, number_of_lip_pursing_occurred,
-                      number_of_blushing_occurred]
+    def process(self):
+        # runs capture, face detection, landmark prediction and feature detection one after another
+        # for every frame (or replays the landmark cache); Pipeline runs the same stages on separate threads
+        self.start()
+        while self.step():
+            pass
+
+        return self.finish()
+
+    def step(self):
+        # analyses the next frame; returns False when the stream ended or "x" was pressed
+        if self.cached_frames is not None:
+            return self.replay_step()
+
+        frame, timestamp = self.read_frame()
+        if frame is None:
+            return False
+
+        frame, gray_frame = self.prepare_frame(frame)
+        faces, forgotten = self.find_faces(gray_frame)
+        return self.analyze_faces(frame, faces, timestamp, forgotten)
+
+    def scores(self):
+        # runs the stream like process, yielding the streaming scores of every subject as soon as they're made
+        if self.scorer is None:
+            raise ValueError("scores are only made with score_every")
+        made_scores = collections.deque()
+        self.scorer.callbacks.append(made_scores.append)
+        try:
+            self.start()
+            while self.step():
+                while made_scores:
+                    yield made_scores.popleft()
+            self.finish()
+            while made_scores:
+                yield made_scores.popleft()
+        finally:
+            self.scorer.callbacks.remove(made_scores.append)
+
+    def frame_ready(self):
+        # whether read_frame returns without waiting: file streams are decoded ahead,
+        # the webcam is ready once it captured a frame that wasn't analysed yet
+        return self.file_stream or self.video_stream.read() is not self.last_frame
+
+    def replay(self):
+        # runs feature detection on the landmarks and cheek colors of a landmark cache, without any frames
+        self.start()
+        while self.replay_step():
+            pass
+
+        return self.finish()
+
+    def replay_step(self):
+        # feature detection on the next record of the landmark cache; returns False at its end
+        if self.replay_position >= len(self.cached_frames):
+            return False
+        record = self.cached_frames[self.replay_position]
+        self.replay_position += 1
+
+        face_region, cheeks_color = None, None
+        if record["face_found"]:
+            face_region = numpy.array(record["landmarks"], dtype=int)
+            cheeks_color = record["cheeks_color"].tolist()
+        return self.analyze(None, face_region, float(record["timestamp"]), cheeks_color=cheeks_color)
+
+    def start(self):
+        self.timestamp = None
+        self.question_start = self.now()
+        self.processing_start = time.time()
+        self.pending_question_times = list(self.question_times)
+        self.frames_read = 0
+        self.frames_analyzed = 0
+        self.stream_ended = False
+        self.last_frame = None
+        self.replay_position = 0
+
+    def read_frame(self):
+        # returns the next frame along with the time it was captured at, or (None, None) when a file stream ends
+        start = self.profiler.start()
+        # if this is a file video stream, check if there are any more frames left in the buffer to process
+        if self.file_stream and not self.video_stream.more():
+            self.stream_ended = True
+            return None, None
+
+        # get the frame from the threaded video stream
+        frame = self.video_stream.read()
+        if frame is None:
+            self.stream_ended = self.file_stream
+            return None, None
+
+        # the webcam stream always returns its latest frame, so wait until it captured a new one
+        if not self.file_stream:
+            while frame is self.last_frame:
+                time.sleep(0.001)
+                frame = self.video_stream.read()
+            self.last_frame = frame
+
+        self.frames_read += 1
+        self.profiler.stop("read", start)
+        if self.file_stream:
+            return frame, self.frames_read / self.fps
+        return frame, time.time()
+
+    def prepare_frame(self, frame):
+        # resize the frame, and convert it to grayscale
+        start = self.profiler.start()
+        frame = imutils.resize(frame, width=800)
+        start = self.profiler.stop("resize", start)
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.profiler.stop("grayscale", start)
+        return frame, gray_frame
+
+    def find_face_region(self, gray_frame):
+        # detect (or track) the face in the grayscale frame, returns the face box and its landmarks
+        start = self.profiler.start()
+        face = self.face_tracker.locate(gray_frame)
+        start = self.profiler.stop("face_detection", start)
+        if face is None:
+            return None, None
+
+        # determine the facial landmarks for the face region, then
+        # convert the facial landmark (x, y)-coordinates to a NumPy array
+        face_region = self.predictor(gray_frame, face)
+        face_region = face_utils.shape_to_np(face_region)
+        self.face_tracker.update(face_region)
+        self.profiler.stop("landmarks", start)
+        return face, face_region
+
+    def find_faces(self, gray_frame):
+        # detect (or track) every face in the grayscale frame and predict its landmarks, returns
+        # (identity, face box, landmarks) of each of them, and the identities of the faces that were lost
+        if not self.multiple_faces:
+            face, face_region = self.find_face_region(gray_frame)
+            return [] if face_region is None else [(self.primary_subject.identity, face, face_region)], []
+
+        start = self.profiler.start()
+        located_faces = self.face_tracker.locate(gray_frame)
+        start = self.profiler.stop("face_detection", start)
+
+        # the landmarks of all faces are predicted on the same grayscale frame
+        faces = []
+        for identity, face in located_faces:
+            face_region = face_utils.shape_to_np(self.predictor(gray_frame, face))
+            self.face_tracker.update(identity, face_region)
+            faces.append((identity, face, face_region))
+        self.profiler.stop("landmarks", start)
+        return faces, self.face_tracker.take_forgotten()
+
+    def analyze_faces(self, frame, faces, timestamp, forgotten=()):
+        # feature detection for every face found in one frame; returns False when processing should stop.
+        # The subjects of forgotten faces go with them, a face seen again later is a new subject
+        if not self.multiple_faces:
+            face, face_region = (faces[0][1], faces[0][2]) if faces else (None, None)
+            return self.analyze(frame, face_region, timestamp, face=face)
+
+        for identity in forgotten:
+            self.subjects.pop(identity, None)
+            if self.scorer is not None:
+                self.scorer.forget(identity)
+        subjects = []
+        for identity, face, face_region in faces:
+            if identity not in self.subjects:
+                self.subjects[identity] = Subject.Subject(identity, self)
+            subjects.append(self.subjects[identity])
+        self.start_frame(timestamp, subjects)
+
+        if faces:
+            # the aspect ratios of all faces are computed at once
+            aspect_ratios = landmark_geometry.aspect_ratios(numpy.array([face[2] for face in faces]))
+            for i, (subject, (identity, face, face_region)) in enumerate(zip(subjects, faces)):
+                subject.analyze(frame, face_region, aspect_ratios=(
+                    float(aspect_ratios[0][i]), float(aspect_ratios[1][i]), float(aspect_ratios[2][i])))
+
+        return self.end_frame(frame, [(subject, face[2]) for subject, face in zip(subjects, faces)])
+
+    def analyze(self, frame, face_region, timestamp, face=None, cheeks_color=None):
+        # feature detection for the one face of a frame; returns False when processing should stop.
+        # The cheek color is computed from the frame unless it is given (when replaying a landmark cache)
+        self.start_frame(timestamp, [self.primary_subject])
+
+        if self.landmark_recorder is not None:
+            start = self.profiler.start()
+            if face_region is not None and cheeks_color is None:
+                cheeks_color = self.primary_subject.calculate_cheeks_color(frame, face_region)
+            self.landmark_recorder.append(timestamp, face, face_region, cheeks_color)
+            # the cheek color is computed here instead of by the blushing detector, so it's timed as blushing
+            self.profiler.stop("blushing" if cheeks_color is not None else "recording", start)
+
+        if face_region is not None:
+            self.primary_subject.analyze(frame, face_region, cheeks_color)
+
+        return self.end_frame(frame, [(self.primary_subject, face_region)])
+
+    def start_frame(self, timestamp, subjects):
+        # a subject's frames (and so its calibration) are only counted in the frames it is analysed in;
+        # the single face counts every frame, as it always did
+        self.timestamp = timestamp
+        self.frame_counter += 1
+        self.frames_analyzed += 1
+        for subject in subjects:
+            subject.frame_counter += 1
+
+    def end_frame(self, frame, subject_faces):
+        # display and question ends, after the features of a frame were detected
+        key = -1
+        if self.visualizer is not None and frame is not None:
+            # draw the overlays and show the frame
+            start = self.profiler.start()
+            for subject, face_region in subject_faces:
+                self.visualizer.draw(frame, subject, face_region)
+                if self.multiple_faces:
+                    self.visualizer.draw_identity(frame, subject.identity, face_region)
+            start = self.profiler.stop("drawing", start)
+            key = self.visualizer.display(frame)
+            self.profiler.stop("display", start)
+        if self.scorer is not None:
+            self.scorer.update([subject for subject, face_region in subject_faces if face_region is not None])
+        self.profiler.frame()
+
+        if key == ord("x"):
+            return False
+
+        # a question ends when "n" is pressed, or when the video reaches its end time
+        question_ended = key == ord("n")
+        if self.pending_question_times and self.now() >= self.pending_question_times[0]:
+            self.pending_question_times.pop(0)
+            question_ended = True
+
+        if question_ended:
+            self.end_question()
+        return True
+
+    def end_question(self):
+        # calculate number of seconds
+        now = self.now()
+        self.seconds = now - self.question_start
+        result = self.detect_if_lie()
+
+        self.questions_counter += 1
+        self.question_start = self.now()
+        return result
+
+    def finish(self):
+        # the last question ends with the stream
+        now = self.now()
+        self.seconds = now - self.question_start
+        self.detect_if_lie()
 
-        if self.algorithm == "knn":
-            prediction = kNN.predict([to_predict], DATASET_PATH)
+        # a cache is only saved for a video analysed to its end without dropping frames
+        if self.landmark_recorder is not None:
+            if self.stream_ended and self.frames_analyzed == self.frames_read:
+                self.landmark_recorder.save()
+            self.landmark_recorder = None
 
+        elapsed = time.time() - self.processing_start
+        if self.face_tracker is None:
+            print("[INFO] Replayed {} frames at {:.1f} fps".format(
+                self.frame_counter, self.frame_counter / elapsed if elapsed > 0 else 0))
         else:
-            prediction = feedforward_nn.predict([to_predict])
-            print(prediction)
+            print("[INFO] Processed {} frames at {:.1f} fps, faces detected on {} of them".format(
+                self.frame_counter, self.frame_counter / elapsed if elapsed > 0 else 0, self.face_tracker.detections))
+        self.profiler.report()
+        return self.results
 
-        prediction = np.round(prediction[0])
-        if prediction == 1:
-            prediction = "truth"
+    def detect_if_lie(self):
+        # features and prediction of every subject seen during the question that just ended;
+        # a single face is always reported, even if it was lost during the question
+        if self.multiple_faces:
+            subjects = [subject for subject in self.subjects.values() if subject.seen_in_question]
         else:
-            prediction = "lie"
+            subjects = [self.primary_subject]
 
-        self.write_to_file(number_of_blinks, number_of_blushing_occurred,
-                           number_of_lip_pursing_occurred, number_of_blinks_per_second, prediction)
+        # get detected features
+        features, blinks = [], []
+        for subject in subjects:
+            to_predict, number_of_blinks = subject.question_features(self.seconds)
+            features.append(to_predict)
+            blinks.append(number_of_blinks)
+        self.question_features.extend(features)
+
+        if self.algorithm is None or not subjects:
+            self.seconds = 0
+            return []
+
+        start = self.profiler.start()
+        probabilities, labels = prediction.predict_batch(features, self.algorithm, DATASET_PATH)
+        self.profiler.stop("prediction", start)
+
+        results = []
+        for subject, to_predict, number_of_blinks, probability, label in zip(subjects, features, blinks,
+                                                                               probabilities, labels):
+            answer = prediction.to_answer(label)
+            print("[INFO] Question {}, subject {}: {} ({:.3f})".format(self.questions_counter, subject.identity,
+                                                                     answer, float(probability)))
+            average_number_of_blinks, number_of_blinks_per_second, number_of_lip_pursing_occurred, \
+                number_of_blushing_occurred = to_predict
+            result = {"question": self.questions_counter, "subject": subject.identity, "seconds": self.seconds,
+                      "blinks": number_of_blinks, "blinks_per_second": number_of_blinks_per_second,
+                      "lip_pursing": number_of_lip_pursing_occurred, "blushing": number_of_blushing_occurred,
+                      "probability": float(probability), "prediction": answer}
+            results.append(result)
+            if self.report_writer is not None:
+                self.report_writer.write(self.report_record(subject, result))
+        self.results.extend(results)
+
+        # the question's records reach the report file now, written by the report's own thread
+        if self.report_writer is not None:
+            self.report_writer.flush()
 
         # reset seconds counter
         self.seconds = 0
-
-    def write_to_file(self, number_of_blinks, number_of_blushing_occurred, number_of_lip_pursing_occurred,
-                      number_of_blinks_per_second, prediction):
-        # write report
-        file = open("test.txt", "a")
-        if self.questions_counter == 1:
-            file.write("\n\n******************************************************\n")
-            file.write("Person averaged")
-            file.write("\n\tblinks: " + str(self.person.average_number_of_blinks))
-            file.write("\n\tnumber of blinks per second: " + str(number_of_blinks_per_second))
-            file.write("\n\tEAR: " + str(self.person.eye_aspect_ratio))
-            file.write("\n\tLAR: " + str(self.person.lips_aspect_ratio))
-            file.write("\n\tlip pursing: " + str(number_of_lip_pursing_occurred))
-            file.write("\n\tcheek color: " + "{:0.0f}".format(self.person.average_cheek_color[2]) + ", "
-                       + "{:0.0f}".format(self.person.average_cheek_color[1]) + ", "
-                       + "{:0.0f}".format(self.person.average_cheek_color[0]))
-
-        file.write("\n\n" + str(self.questions_counter) + ". Detected:")
-        file.write("\n\tblinks detected: " + str(number_of_blinks))
-        file.write("\n\tnumber of blinks per second: " + str(number_of_blinks_per_second))
-        file.write("\n\tnumber of blushing occurred:  " + str(number_of_blushing_occurred))
-        file.write("\n\tnumber of pursing occurred:  " + str(number_of_lip_pursing_occurred))
-        file.write("\n\n\tPredicted:  " + prediction)
-
-        file.close()
+        return results
+
+    def report_record(self, subject, result):
+        # what the report keeps of a question: its result, the subject's averages and when it ended
+        person = subject.person
+        record = dict(result, time=self.now(), video=self.video_path, person={
+            "average_number_of_blinks": person.average_number_of_blinks,
+            "average_number_of_lip_pursing": person.average_number_of_lip_pursing,
+            "eye_aspect_ratio": person.eye_aspect_ratio,
+            "lips_aspect_ratio": person.lips_aspect_ratio,
+            "average_cheek_color": [float(color) for color in person.average_cheek_color]})
+        return record
 
     def destroy(self):
-        cv2.destroyAllWindows()
-        self.video_stream.stop()
+        if self.visualizer is not None:
+            cv2.destroyAllWindows()
+        if self.video_stream is not None:
+            self.video_stream.stop()
+        if self.report_writer is not None:
+            self.report_writer.close()
+        self.profiler.close()
@@ -1,39 +1,43 @@
-class Person:
+import RunningStats
+
 
-    def __init__(self):
-        self.average_cheek_color = [0, 0, 0]
-        self.eye_aspect_ratio = 0
-        self.lips_aspect_ratio = 0
+class Person:
+    # The person's baseline, measured over the calibration frames: the mean (and spread) of their eye and lips
+    # aspect ratios and cheek color, and how often they blink and purse their lips. With a half_life (in frames)
+    # the averages are exponentially weighted instead, so they follow slow changes.
+
+    def __init__(self, half_life=None):
+        self.cheek_colors = RunningStats.RunningStats(3, half_life)
+        self.eye_aspect_ratios = RunningStats.RunningStats(half_life=half_life)
+        self.lips_aspect_ratios = RunningStats.RunningStats(half_life=half_life)
         self.average_number_of_blinks = 0
         self.average_number_of_lip_pursing = 0
 
+    @property
+    def average_cheek_color(self):
+        # a new list every time, so whoever keeps it can't change the baseline
+        return [float(color) for color in self.cheek_colors.average]
+
+    @property
+    def eye_aspect_ratio(self):
+        return float(self.eye_aspect_ratios.average)
+
+    @property
+    def lips_aspect_ratio(self):
+        return float(self.lips_aspect_ratios.average)
+
     def set_average_number_of_blinks(self, num, seconds = 1):
         if num > 0 and seconds > 0:
             self.average_number_of_blinks = num/seconds
 
-    def set_average_cheek_color(self, cheek_color):
-        self.average_cheek_color = cheek_color
-
     def calculate_average_color(self, color):
-        if self.average_cheek_color[0] == 0 and self.average_cheek_color[1] == 0 and self.average_cheek_color[2] == 0:
-            self.average_cheek_color = color
-        else:
-            self.average_cheek_color[2] = (self.average_cheek_color[2] + color[2]) / 2.0
-            self.average_cheek_color[1] = (self.average_cheek_color[1] + color[1]) / 2.0
-            self.average_cheek_color[0] = (self.average_cheek_color[0] + color[0]) / 2.0
+        self.cheek_colors.update(color)
 
     def set_average_number_of_lip_pursing(self, num):
         self.average_number_of_lip_pursing = num
 
     def calculate_average_eye_aspect_ratio(self, ratio):
-        if self.eye_aspect_ratio == 0:
-            self.eye_aspect_ratio = ratio
-        else:
-            self.eye_aspect_ratio = (self.eye_aspect_ratio + ratio)/2.0
+        self.eye_aspect_ratios.update(ratio)
 
     def calculate_average_lips_aspect_ratio(self, ratio):
-        if self.lips_aspect_ratio == 0:
-            self.lips_aspect_ratio = ratio
-        else:
-            self.lips_aspect_ratio = (self.lips_aspect_ratio + ratio) / 2.0
-
+        self.lips_aspect_ratios.update(ratio)
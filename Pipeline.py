@@ -0,0 +1,113 @@
+import queue
+import threading
+
+# what a stage does when the queue to the next stage is full: wait for it (no frame is lost, used for video files),
+# or drop the oldest queued frame so a slow stage never stalls capture (used for live input)
+DROP_POLICIES = ("block", "drop_oldest")
+
+# marks the end of the stream in the queues
+END = None
+
+
+class Pipeline:
+    # Runs the stages of a LieDetector on separate threads connected by bounded queues:
+    # capture -> resize, face detection and landmarks -> feature detection and display (on the calling thread).
+    # dlib and OpenCV release the GIL while they work, so the stages overlap. Every frame keeps the time it was
+    # captured at, so blink rates stay accurate however late a frame is analysed.
+
+    def __init__(self, lie_detector, queue_size=4, drop_policy=None):
+        self.lie_detector = lie_detector
+        if drop_policy is None:
+            drop_policy = "block" if lie_detector.file_stream else "drop_oldest"
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError("Unknown drop policy '" + drop_policy + "', expected one of " + repr(DROP_POLICIES))
+        self.drop_policy = drop_policy
+
+        self.captured_frames = queue.Queue(maxsize=queue_size)
+        self.face_regions = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.dropped_frames = 0
+
+    def process(self):
+        # a video replayed from its landmark cache has no stages to overlap
+        if self.lie_detector.cached_frames is not None:
+            return self.lie_detector.replay()
+
+        self.lie_detector.start()
+        threads = [threading.Thread(target=self.capture, daemon=True),
+                   threading.Thread(target=self.find_faces, daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self.get(self.face_regions)
+                if item is END:
+                    break
+                frame, faces, forgotten, timestamp = item
+                if not self.lie_detector.analyze_faces(frame, faces, timestamp, forgotten):
+                    break
+        finally:
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+
+        if self.dropped_frames:
+            print("[INFO] Dropped {} frames to keep up with the stream".format(self.dropped_frames))
+        return self.lie_detector.finish()
+
+    def capture(self):
+        try:
+            while not self.stopped.is_set():
+                frame, timestamp = self.lie_detector.read_frame()
+                if frame is None:
+                    break
+                self.put(self.captured_frames, (frame, timestamp))
+        finally:
+            self.put(self.captured_frames, END, drop=False)
+
+    def find_faces(self):
+        try:
+            while not self.stopped.is_set():
+                item = self.get(self.captured_frames)
+                if item is END:
+                    break
+                frame, timestamp = item
+                frame, gray_frame = self.lie_detector.prepare_frame(frame)
+                faces, forgotten = self.lie_detector.find_faces(gray_frame)
+                self.put(self.face_regions, (frame, faces, forgotten, timestamp))
+        finally:
+            self.put(self.face_regions, END, drop=False)
+
+    def put(self, target_queue, item, drop=True):
+        while not self.stopped.is_set():
+            if self.drop_policy == "drop_oldest" and drop:
+                try:
+                    target_queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    # make room by dropping the oldest frame waiting in the queue
+                    try:
+                        dropped = target_queue.get_nowait()
+                        if target_queue is self.face_regions:
+                            # the faces lost by the dropped frame are lost in this one too
+                            item[2].extend(dropped[2])
+                        self.dropped_frames += 1
+                        self.lie_detector.profiler.drop_frame()
+                    except queue.Empty:
+                        pass
+            else:
+                try:
+                    target_queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+    def get(self, source_queue):
+        # returns the next item, or END once the pipeline is stopped
+        while not self.stopped.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return END
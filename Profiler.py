@@ -0,0 +1,200 @@
+import collections
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# latency histograms have this many buckets per power of ten, from 1 microsecond up to 100 seconds,
+# so a percentile is accurate to about 6%
+BUCKETS_PER_DECADE = 40
+SMALLEST_LATENCY = 1e-6
+NUMBER_OF_BUCKETS = 8 * BUCKETS_PER_DECADE + 1
+
+PERCENTILES = (50, 95, 99)
+
+
+class NullProfiler:
+    # what LieDetector uses when profiling is off: every call returns immediately and nothing is recorded
+
+    def start(self):
+        return 0.0
+
+    def stop(self, stage, start):
+        return 0.0
+
+    def frame(self):
+        pass
+
+    def drop_frame(self):
+        pass
+
+    def snapshot(self):
+        return None
+
+    def report(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Profiler(NullProfiler):
+    # Latency histograms of every stage of the frame loop (read, resize, face detection, landmarks, each detector,
+    # drawing, display, prediction), the rolling frame rate and the number of dropped frames. Every stage is timed
+    # between start() and stop(stage, start); the stages of a frame may be timed on different threads.
+    # The metrics are written as json to metrics_path every write_interval seconds, and/or served at
+    # http://127.0.0.1:<port>/metrics
+
+    def __init__(self, metrics_path=None, port=None, fps_window=5.0, write_interval=1.0):
+        self.metrics_path = metrics_path
+        self.write_interval = write_interval
+        self.histograms = collections.OrderedDict()
+        self.totals = {}
+        self.maximums = {}
+
+        self.frames = 0
+        self.dropped_frames = 0
+        self.created = time.perf_counter()
+        self.last_write = self.created
+        # end times of the frames analysed in the last fps_window seconds
+        self.fps_window = fps_window
+        self.frame_times = collections.deque()
+
+        self.server = None
+        if port is not None:
+            self.serve(port)
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, stage, start):
+        # records the latency of a stage that started at start, and returns the current time so the next stage
+        # can start from it
+        now = time.perf_counter()
+        latency = now - start
+
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = [0] * NUMBER_OF_BUCKETS
+            self.totals[stage] = 0.0
+            self.maximums[stage] = 0.0
+        histogram[self.bucket(latency)] += 1
+        self.totals[stage] += latency
+        if latency > self.maximums[stage]:
+            self.maximums[stage] = latency
+        return now
+
+    def frame(self):
+        # marks the end of a frame
+        now = time.perf_counter()
+        self.frames += 1
+        self.frame_times.append(now)
+        while now - self.frame_times[0] > self.fps_window:
+            self.frame_times.popleft()
+
+        if self.metrics_path is not None and now - self.last_write >= self.write_interval:
+            self.write()
+
+    def drop_frame(self):
+        self.dropped_frames += 1
+
+    def fps(self):
+        # frame rate over the last fps_window seconds
+        frame_times = list(self.frame_times)
+        if len(frame_times) < 2 or frame_times[-1] <= frame_times[0]:
+            return 0.0
+        return (len(frame_times) - 1) / (frame_times[-1] - frame_times[0])
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.created
+        stages = collections.OrderedDict()
+        for stage, histogram in list(self.histograms.items()):
+            histogram = list(histogram)
+            count = sum(histogram)
+            if count == 0:
+                continue
+            stage_metrics = collections.OrderedDict([("count", count),
+                                                     ("mean_ms", 1000 * self.totals[stage] / count)])
+            for percentile in PERCENTILES:
+                # a bucket's upper edge may be above the slowest latency that fell in it
+                stage_metrics["p{}_ms".format(percentile)] = 1000 * min(self.percentile(histogram, count, percentile),
+                                                                        self.maximums[stage])
+            stage_metrics["max_ms"] = 1000 * self.maximums[stage]
+            stages[stage] = stage_metrics
+
+        return collections.OrderedDict([
+            ("frames", self.frames),
+            ("dropped_frames", self.dropped_frames),
+            ("fps", self.fps()),
+            ("average_fps", self.frames / elapsed if elapsed > 0 else 0.0),
+            ("stages", stages),
+        ])
+
+    def write(self):
+        self.last_write = time.perf_counter()
+        # written under a temporary name and renamed, so a reader never sees a half written file
+        temporary_path = self.metrics_path + ".tmp"
+        with open(temporary_path, "w") as metrics_file:
+            json.dump(self.snapshot(), metrics_file, indent=2)
+        os.replace(temporary_path, self.metrics_path)
+
+    def report(self):
+        snapshot = self.snapshot()
+        print("[INFO] {} frames, {:.1f} fps (last {:.0f}s), {:.1f} fps on average, {} dropped".format(
+            snapshot["frames"], snapshot["fps"], self.fps_window, snapshot["average_fps"], snapshot["dropped_frames"]))
+        print("{:>14} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9}".format("stage", "count", "mean ms", "p50 ms", "p95 ms",
+                                                                   "p99 ms", "max ms"))
+        for stage, metrics in snapshot["stages"].items():
+            print("{:>14} {:>8} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+                stage, metrics["count"], metrics["mean_ms"], metrics["p50_ms"], metrics["p95_ms"], metrics["p99_ms"],
+                metrics["max_ms"]))
+
+    def serve(self, port):
+        profiler = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(profiler.snapshot(), indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        # only reachable from this machine
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print("[INFO] Serving metrics at http://127.0.0.1:{}/metrics".format(self.server.server_address[1]))
+
+    def close(self):
+        if self.metrics_path is not None:
+            self.write()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @staticmethod
+    def bucket(latency):
+        if latency <= SMALLEST_LATENCY:
+            return 0
+        return min(int(math.log10(latency / SMALLEST_LATENCY) * BUCKETS_PER_DECADE) + 1, NUMBER_OF_BUCKETS - 1)
+
+    @staticmethod
+    def percentile(histogram, count, percentile):
+        # upper edge of the bucket the percentile falls in
+        rank = math.ceil(count * percentile / 100.0)
+        seen = 0
+        for bucket, bucket_count in enumerate(histogram):
+            seen += bucket_count
+            if seen >= rank:
+                return SMALLEST_LATENCY * 10 ** (bucket / float(BUCKETS_PER_DECADE))
+        return SMALLEST_LATENCY * 10 ** ((len(histogram) - 1) / float(BUCKETS_PER_DECADE))
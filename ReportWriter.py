@@ -0,0 +1,98 @@
+import json
+import queue
+import threading
+
+# what the writer thread is told besides records: write out what's buffered, or write it out and stop
+FLUSH = "flush"
+END = None
+
+
+def format_json(record):
+    # one JSON object per line; numpy numbers and arrays are written as plain numbers and lists
+    return json.dumps(record, default=lambda value: value.tolist()) + "\n"
+
+
+class TextFormatter:
+    # the human readable report LieDetector used to write: the person's averages the first time a subject is
+    # reported, then what was detected and predicted in every question. Faces are only named when there can be
+    # more than one
+
+    def __init__(self, name_faces=False):
+        self.name_faces = name_faces
+        self.reported_subjects = set()
+
+    def __call__(self, record):
+        face = " (face {})".format(record["subject"]) if self.name_faces else ""
+        person = record["person"]
+        text = ""
+        if record["subject"] not in self.reported_subjects:
+            self.reported_subjects.add(record["subject"])
+            text += "\n\n******************************************************\n"
+            text += "Person averaged" + face
+            text += "\n\tblinks: " + str(person["average_number_of_blinks"])
+            text += "\n\tnumber of blinks per second: " + str(record["blinks_per_second"])
+            text += "\n\tEAR: " + str(person["eye_aspect_ratio"])
+            text += "\n\tLAR: " + str(person["lips_aspect_ratio"])
+            text += "\n\tlip pursing: " + str(record["lip_pursing"])
+            text += "\n\tcheek color: " + "{:0.0f}".format(person["average_cheek_color"][2]) + ", " \
+                    + "{:0.0f}".format(person["average_cheek_color"][1]) + ", " \
+                    + "{:0.0f}".format(person["average_cheek_color"][0])
+
+        text += "\n\n" + str(record["question"]) + ". Detected" + face + ":"
+        text += "\n\tblinks detected: " + str(record["blinks"])
+        text += "\n\tnumber of blinks per second: " + str(record["blinks_per_second"])
+        text += "\n\tnumber of blushing occurred:  " + str(record["blushing"])
+        text += "\n\tnumber of pursing occurred:  " + str(record["lip_pursing"])
+        text += "\n\n\tPredicted:  " + record["prediction"]
+        return text
+
+
+def get_formatter(path, name_faces=False):
+    # .txt reports keep the legacy text layout, anything else (e.g. report.jsonl) is written as JSON Lines
+    if path.endswith(".txt"):
+        return TextFormatter(name_faces)
+    return format_json
+
+
+class ReportWriter:
+    # Appends the records of every question to a report file from a background thread, so the frame loop never
+    # waits on the disk. Records are queued (blocking only if the bounded queue is full), formatted and written in
+    # batches, and the file is flushed at every question boundary and when the writer is closed.
+
+    def __init__(self, path, formatter=None, queue_size=256):
+        self.path = path
+        self.formatter = formatter if formatter is not None else get_formatter(path)
+        self.records = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        self.records.put(record)
+
+    def flush(self):
+        # everything written so far reaches the file, without waiting for it
+        self.records.put(FLUSH)
+
+    def close(self):
+        # write out everything queued and wait for the writer thread to end
+        if self.thread.is_alive():
+            self.records.put(END)
+            self.thread.join()
+
+    def run(self):
+        with open(self.path, "a") as report_file:
+            while True:
+                # take everything queued at once and write it in one go
+                items = [self.records.get()]
+                while True:
+                    try:
+                        items.append(self.records.get_nowait())
+                    except queue.Empty:
+                        break
+
+                records = [item for item in items if item is not END and item is not FLUSH]
+                report_file.write("".join(self.formatter(record) for record in records))
+                if END in items:
+                    return
+                if FLUSH in items:
+                    report_file.flush()
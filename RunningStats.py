@@ -0,0 +1,52 @@
+import numpy
+
+
+class RunningStats:
+    # Mean and variance of a stream of values, a number or a vector such as a BGR color, in constant memory:
+    # Welford's algorithm updates them with every value, without keeping any of them. With a half_life (in values)
+    # an exponentially weighted mean is kept too, which follows a baseline that drifts, e.g. with the lighting.
+
+    __slots__ = ("count", "mean", "m2", "half_life", "decay", "weighted_mean")
+
+    def __init__(self, size=None, half_life=None):
+        self.count = 0
+        # vectors of size values are kept in arrays, numbers in floats
+        self.mean = 0.0 if size is None else numpy.zeros(size)
+        # sum of the squared differences from the mean
+        self.m2 = 0.0 if size is None else numpy.zeros(size)
+        self.half_life = half_life
+        # weight the weighted mean keeps with every new value, so a value's weight halves after half_life more
+        self.decay = 0.5 ** (1.0 / half_life) if half_life else None
+        self.weighted_mean = None
+
+    def update(self, value):
+        if not isinstance(self.mean, float):
+            value = numpy.asarray(value, dtype=numpy.float64)
+        self.count += 1
+        delta = value - self.mean
+        # new objects rather than in-place updates, so neither value nor a returned mean changes later
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (value - self.mean)
+
+        if self.decay is not None:
+            if self.weighted_mean is None:
+                self.weighted_mean = value
+            else:
+                self.weighted_mean = self.decay * self.weighted_mean + (1 - self.decay) * value
+
+    @property
+    def average(self):
+        # the weighted mean when there is a half-life, the mean of every value otherwise
+        if self.weighted_mean is not None:
+            return self.weighted_mean
+        return self.mean
+
+    @property
+    def variance(self):
+        if self.count == 0:
+            return self.m2
+        return self.m2 / self.count
+
+    @property
+    def std(self):
+        return self.variance ** 0.5
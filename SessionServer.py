@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+
+import LieDetector
+
+# marks the end of the work in the queue of ready streams
+END = None
+
+
+class SessionServer:
+    # Analyses many streams (webcams, stream urls or video files) in one process. The landmark predictor and
+    # prediction models are loaded once and shared, while every stream keeps its own LieDetector: face tracking,
+    # the person's baseline, the detectors and the questions. Every worker thread has its own HOG face detector,
+    # as dlib's can't be used by several threads at once.
+    # A pool of worker threads serves the streams in turn, one frame at a time: a stream is queued again behind the
+    # others once its frame is analysed, so a fast stream can't starve the rest, and the frames of a stream are
+    # always analysed one after another in order. dlib and OpenCV release the GIL, so the workers overlap.
+
+    def __init__(self, algorithm, workers=4, **options):
+        self.algorithm = algorithm
+        self.workers = workers
+        # LieDetector options every stream is created with, e.g. detection_interval or max_faces
+        self.options = options
+        self.streams = {}
+        self.results = {}
+        self.errors = {}
+
+        self.ready_streams = queue.Queue()
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.running_streams = 0
+
+        # load the shared landmark predictor up front, not in the first stream
+        LieDetector.get_shape_predictor()
+
+    def add_stream(self, name, video_path=None, camera=0, question_times=None, **options):
+        # a stream of a video file (or url) or of the camera with index camera, with its own LieDetector;
+        # streams can't display anything, as they're analysed off the main thread
+        stream_options = dict(self.options, **options)
+        stream_options.setdefault("report_path", None)
+        lie_detector = LieDetector.LieDetector(self.algorithm, video_path=video_path, camera=camera,
+                                               question_times=question_times, display=False, **stream_options)
+        self.streams[name] = lie_detector
+        return lie_detector
+
+    def run(self):
+        # analyses every stream to its end (or until stop is called), returns the results of every stream by name
+        for name, lie_detector in self.streams.items():
+            if lie_detector.cached_frames is None:
+                lie_detector.start()
+            self.running_streams += 1
+            self.ready_streams.put(name)
+        if not self.streams:
+            return self.results
+
+        threads = [threading.Thread(target=self.work, daemon=True) for _ in range(self.workers)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.1)
+        except KeyboardInterrupt:
+            # the streams finish after the frame they are at
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.time() - start
+        total_frames = sum(lie_detector.frame_counter for lie_detector in self.streams.values())
+        print("[INFO] Served {} streams, {} frames in {:.1f}s, {:.1f} fps overall".format(
+            len(self.streams), total_frames, elapsed, total_frames / elapsed if elapsed > 0 else 0))
+        return self.results
+
+    def stop(self):
+        self.stopped.set()
+
+    def work(self):
+        while True:
+            name = self.ready_streams.get()
+            if name is END:
+                return
+            lie_detector = self.streams[name]
+
+            # a camera without a new frame goes back in the queue, so it doesn't hold up a worker
+            if not self.stopped.is_set() and lie_detector.cached_frames is None and not lie_detector.frame_ready():
+                self.ready_streams.put(name)
+                time.sleep(0.001)
+                continue
+
+            try:
+                if lie_detector.cached_frames is not None:
+                    # a landmark cache replays in milliseconds, so it takes a single turn
+                    self.results[name] = lie_detector.replay()
+                elif not self.stopped.is_set() and lie_detector.step():
+                    self.ready_streams.put(name)
+                    continue
+                else:
+                    self.results[name] = lie_detector.finish()
+            except Exception as error:
+                print("[INFO] Stream {} failed: {!r}".format(name, error))
+                self.errors[name] = error
+            self.finish_stream(name)
+
+    def finish_stream(self, name):
+        try:
+            self.streams[name].destroy()
+        except Exception as error:
+            print("[INFO] Stream {} failed to close: {!r}".format(name, error))
+            self.errors.setdefault(name, error)
+        finally:
+            # counted even if the stream failed to close, or run would wait for it forever
+            with self.lock:
+                self.running_streams -= 1
+                if self.running_streams == 0:
+                    # every stream ended, let all workers go
+                    for _ in range(self.workers):
+                        self.ready_streams.put(END)
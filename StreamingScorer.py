@@ -0,0 +1,145 @@
+import math
+
+import prediction
+
+# the events counted in every frame, in the order of the rolling totals
+EVENTS = ("blinks", "lip_pursing", "blushing")
+
+
+class RollingCounts:
+    # Events of every frame of the last window seconds, in fixed-size ring buffers kept with their running totals:
+    # adding a frame drops the frames that left the window and updates the totals, without ever summing the
+    # buffers. The capacity should cover the window at the highest frame rate; beyond it the oldest frames are
+    # dropped early.
+
+    __slots__ = ("window", "times", "counts", "start", "size", "totals", "first_time")
+
+    def __init__(self, window, capacity):
+        self.window = window
+        self.times = [0.0] * capacity
+        self.counts = [None] * capacity
+        # index of the oldest frame, and number of frames in the buffers
+        self.start = 0
+        self.size = 0
+        self.totals = [0] * len(EVENTS)
+        self.first_time = None
+
+    def add(self, time, counts):
+        capacity = len(self.times)
+        self.expire(time, capacity - 1)
+
+        index = (self.start + self.size) % capacity
+        self.times[index] = time
+        self.counts[index] = counts
+        self.size += 1
+        for i in range(len(self.totals)):
+            self.totals[i] += counts[i]
+        if self.first_time is None:
+            self.first_time = time
+
+    def expire(self, time, max_size=None):
+        # drops the frames that left the window by the given time (and the oldest frames beyond max_size),
+        # so the totals only count the last window seconds even when no frame was added since
+        capacity = len(self.times)
+        if max_size is None:
+            max_size = capacity
+        while self.size and (self.size > max_size or self.times[self.start] <= time - self.window):
+            oldest = self.counts[self.start]
+            for i in range(len(self.totals)):
+                self.totals[i] -= oldest[i]
+            self.start = (self.start + 1) % capacity
+            self.size -= 1
+
+    def seconds(self, time):
+        # length of the window so far, shorter than window until that much time was seen
+        return min(self.window, time - self.first_time)
+
+
+class StreamingScorer:
+    # Scores every subject of a LieDetector continuously instead of once per question. After a subject's calibration
+    # the blinks, lip pursing and blushing its detectors count in every frame are kept in RollingCounts over the last
+    # window_seconds, and every `every` frames all subjects are predicted from those windows in one batch, with the
+    # models loaded once. Every score is passed to the callbacks; LieDetector.scores iterates over them.
+
+    def __init__(self, session, window_seconds=10.0, every=30, callback=None, max_fps=60,
+                 data_set_path=prediction.DATASET_PATH):
+        self.session = session
+        self.data_set_path = data_set_path
+        self.window_seconds = window_seconds
+        self.every = every
+        self.capacity = int(math.ceil(window_seconds * max_fps)) + 1
+        self.callbacks = [callback] if callback is not None else []
+        # rolling counts of every subject by identity, and its detectors' counters at the last frame
+        self.windows = {}
+        self.last_counters = {}
+        # the detectors' counters are reset at the end of every question
+        self.question = None
+        self.frames = 0
+
+    def update(self, subjects):
+        # adds the events of the frame just analysed for the subjects seen in it, and scores every `every` frames
+        session = self.session
+        now = session.now()
+        if session.questions_counter != self.question:
+            self.question = session.questions_counter
+            self.last_counters = {}
+
+        for subject in subjects:
+            identity = subject.identity
+            # the counts of the calibration frames are the baseline, not events
+            if subject.frame_counter <= session.frames_to_inspect:
+                continue
+            counters = (subject.blink_detector.total_blink_counter,
+                        subject.pursed_lips_detector.total_pursed_counter,
+                        subject.blushing_detector.blushing_occurred_counter)
+            last_counters = self.last_counters.get(identity, (0, 0, 0))
+            self.last_counters[identity] = counters
+
+            window = self.windows.get(identity)
+            if window is None:
+                window = self.windows[identity] = RollingCounts(self.window_seconds, self.capacity)
+            window.add(now, (counters[0] - last_counters[0], counters[1] - last_counters[1],
+                             counters[2] - last_counters[2]))
+
+        self.frames += 1
+        if self.frames % self.every == 0 and self.windows:
+            return self.score(now)
+        return []
+
+    def forget(self, identity):
+        # a subject that went away is no longer scored
+        self.windows.pop(identity, None)
+        self.last_counters.pop(identity, None)
+
+    def score(self, now):
+        start = self.session.profiler.start()
+        identities, features = [], []
+        for identity, window in self.windows.items():
+            # a subject that wasn't seen lately has no new frames that would have expired the old ones
+            window.expire(now)
+            blinks, lip_pursing, blushing = window.totals
+            seconds = window.seconds(now)
+            blinks_per_second = blinks / seconds if seconds > 0 else blinks
+            identities.append(identity)
+            features.append([self.session.subjects[identity].person.average_number_of_blinks, blinks_per_second,
+                             lip_pursing, blushing])
+
+        probabilities, labels = [None] * len(features), [None] * len(features)
+        if self.session.algorithm is not None:
+            probabilities, labels = prediction.predict_batch(features, self.session.algorithm, self.data_set_path)
+
+        scores = []
+        for identity, to_predict, probability, label in zip(identities, features, probabilities, labels):
+            window = self.windows[identity]
+            scores.append({
+                "time": now, "frame": self.session.frame_counter, "subject": identity,
+                "seconds": window.seconds(now), "blinks": window.totals[0], "blinks_per_second": to_predict[1],
+                "lip_pursing": window.totals[1], "blushing": window.totals[2],
+                "probability": None if probability is None else float(probability),
+                "prediction": None if label is None else prediction.to_answer(label)})
+        self.session.profiler.stop("scoring", start)
+
+        for score in scores:
+            for callback in self.callbacks:
+                callback(score)
+        return scores
@@ -0,0 +1,128 @@
+import BlinkDetector
+import BlushingDetector
+import Person
+import PursedLipsDetector
+
+
+class Subject:
+    # One face of a session: the person's baseline and the detectors that count their blinks, lip pursing and
+    # blushing. A LieDetector has a subject for every face it follows, and feeds each one the landmarks of its own
+    # face; everything else (time, questions, display) belongs to the session.
+
+    def __init__(self, identity, session):
+        self.identity = identity
+        # the LieDetector this subject is analysed in, for its time, calibration length and profiler
+        self.session = session
+        self.person = Person.Person(session.baseline_half_life)
+        self.blink_detector = BlinkDetector.BlinkDetector()
+        self.pursed_lips_detector = PursedLipsDetector.PursedLipsDetector()
+        self.blushing_detector = BlushingDetector.BlushingDetector()
+        # frames of the session since this subject was first seen, calibration is counted in these
+        self.frame_counter = 0
+        # whether the face was seen during the current question
+        self.seen_in_question = False
+        # time this subject's blinks started being counted for its baseline
+        self.blink_counting_start = None
+
+    def analyze(self, frame, face_region, cheeks_color=None, aspect_ratios=None):
+        # feature detection on this subject's face in one frame. The cheek color is computed from the frame unless
+        # it is given, and aspect_ratios can hold the (eye, lips, lips with smile) aspect ratios computed already
+        session = self.session
+        profiler = session.profiler
+        self.seen_in_question = True
+        eye_aspect_ratio, lips_aspect_ratio, smile_lips_aspect_ratio = aspect_ratios or (None, None, None)
+        start = profiler.start()
+
+        # inspect face and calculate average values of interest
+        if self.frame_counter < session.frames_to_inspect:
+
+            if self.frame_counter < session.frames_to_inspect_eyes:
+                # calculate average eye and lips aspect ratio through the first couple of frames
+                self.calculate_eye_aspect_ratio(face_region, eye_aspect_ratio)
+                self.calculate_lips_aspect_ratio(face_region, lips_aspect_ratio)
+
+            elif self.frame_counter < session.frames_to_inspect_eyes + 3:
+                # calculate eye and lips aspect ratio threshold value
+                # depending on which blink detector will detect blinks
+                self.blink_detector.calculate_eye_aspect_ratio_threshold(
+                    self.person.eye_aspect_ratio, float(self.person.eye_aspect_ratios.std))
+                self.pursed_lips_detector.calculate_lips_aspect_ratio_threshold(
+                    self.person.lips_aspect_ratio, float(self.person.lips_aspect_ratios.std))
+            else:
+                # calculate average number of blinks and lip pursing
+                if self.blink_counting_start is None:
+                    self.blink_counting_start = session.now()
+                self.blink_detector.detect(face_region, eye_aspect_ratio)
+                self.pursed_lips_detector.detect(face_region, smile_lips_aspect_ratio)
+
+            # calculate average cheek color
+            self.calculate_average_cheek_color(frame, face_region, cheeks_color)
+            profiler.stop("calibration", start)
+
+        elif self.frame_counter == session.frames_to_inspect:
+            print("SET AVERAGE VALUES")
+            # set values of interest to the respective detectors
+            self.blushing_detector.set_average_cheek_color(self.person.average_cheek_color)
+
+            # set average number of blinks and lip pursing to the person. The first face's blinks are averaged
+            # since the question started, as the prediction models were trained with; a face that showed up later
+            # counted its blinks since its own counting started, or since the last question ended, which resets
+            # the count
+            if self is session.primary_subject:
+                counted_since = session.question_start
+            elif self.blink_counting_start is not None:
+                counted_since = max(self.blink_counting_start, session.question_start)
+            else:
+                counted_since = session.now()
+            self.person.set_average_number_of_blinks(self.blink_detector.get_and_reset_number_of_blinks(),
+                                                     session.now() - counted_since)
+            self.person.set_average_number_of_lip_pursing(
+                self.pursed_lips_detector.get_and_reset_number_of_lip_pursing())
+            print(self.person.average_cheek_color)
+            print(self.person.average_number_of_blinks)
+            print(self.person.average_number_of_lip_pursing)
+
+        # detect blinks, lip pursing and blushing
+        else:
+            self.blink_detector.detect(face_region, eye_aspect_ratio)
+            start = profiler.stop("blinks", start)
+            self.pursed_lips_detector.detect(face_region, smile_lips_aspect_ratio)
+            start = profiler.stop("lip_pursing", start)
+            self.blushing_detector.detect(frame, face_region, cheeks_color)
+            profiler.stop("blushing", start)
+
+    def question_features(self, seconds):
+        # the features of the question that just ended, [average blinks, blinks per second, lip pursing, blushing],
+        # resetting the detectors' counts for the next one
+        number_of_blinks = self.blink_detector.get_and_reset_number_of_blinks()
+        number_of_blushing_occurred = self.blushing_detector.get_number_of_blushing_occurred_and_reset()
+        number_of_lip_pursing_occurred = self.pursed_lips_detector.get_and_reset_number_of_lip_pursing()
+        self.seen_in_question = False
+
+        if seconds > 0:
+            number_of_blinks_per_second = number_of_blinks / seconds
+        else:
+            number_of_blinks_per_second = number_of_blinks
+
+        return [self.person.average_number_of_blinks, number_of_blinks_per_second, number_of_lip_pursing_occurred,
+                number_of_blushing_occurred], number_of_blinks
+
+    def calculate_cheeks_color(self, frame, face_region):
+        left_cheek = face_region[self.blushing_detector.left_cheek_idx]
+        right_cheek = face_region[self.blushing_detector.right_cheek_idx]
+        return self.blushing_detector.calculate_cheeks_color(frame, right_cheek, left_cheek)
+
+    def calculate_average_cheek_color(self, frame, face_region, cheeks_color=None):
+        if cheeks_color is None:
+            cheeks_color = self.calculate_cheeks_color(frame, face_region)
+        self.person.calculate_average_color(cheeks_color)
+
+    def calculate_eye_aspect_ratio(self, face_region, EAR=None):
+        if EAR is None:
+            EAR, left_eye, right_eye = self.blink_detector.calculate_eye_aspect_ratio(face_region)
+        self.person.calculate_average_eye_aspect_ratio(EAR)
+
+    def calculate_lips_aspect_ratio(self, face_region, LAR=None):
+        if LAR is None:
+            LAR, mouth = self.pursed_lips_detector.lips_aspect_ratio(face_region, consider_smile=False)
+        self.person.calculate_average_lips_aspect_ratio(LAR)
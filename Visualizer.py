@@ -0,0 +1,115 @@
+import cv2
+import numpy
+
+import BlinkDetector
+import BlushingDetector
+import PursedLipsDetector
+
+
+class Visualizer:
+    # the detectors only compute features; everything that is drawn on screen is drawn here, once per frame,
+    # and only when a display is attached
+
+    def __init__(self, window_name="Lie detector", cheeks_window_name="Cheeks"):
+        self.window_name = window_name
+        self.cheeks_window_name = cheeks_window_name
+
+    def show(self, frame, subject, face_region=None):
+        # draws the overlays of the last inspected frame, shows it and returns the pressed key
+        self.draw(frame, subject, face_region)
+        return self.display(frame)
+
+    def draw(self, frame, subject, face_region=None):
+        # subject is whatever holds the detectors and the person of the face: a Subject, or a LieDetector
+        if face_region is not None:
+            self.draw_face(frame, subject, face_region)
+
+    def display(self, frame):
+        cv2.imshow(self.window_name, frame)
+        return cv2.waitKey(1) & 0xFF
+
+    def draw_face(self, frame, subject, face_region):
+        blink_detector = subject.blink_detector
+        pursed_lips_detector = subject.pursed_lips_detector
+        blushing_detector = subject.blushing_detector
+
+        left_eye = face_region[BlinkDetector.BlinkDetector.left_eye_start:BlinkDetector.BlinkDetector.left_eye_end]
+        right_eye = face_region[BlinkDetector.BlinkDetector.right_eye_start:BlinkDetector.BlinkDetector.right_eye_end]
+        self.draw_eyes(frame, left_eye, right_eye)
+        self.print_blinks(frame, blink_detector.total_blink_counter, blink_detector.last_eye_aspect_ratio)
+
+        mouth = face_region[PursedLipsDetector.PursedLipsDetector.mouth_start:
+                            PursedLipsDetector.PursedLipsDetector.mouth_end]
+        self.draw_mouth(frame, mouth)
+        self.print_pursed_lips(frame, pursed_lips_detector.total_pursed_counter,
+                               pursed_lips_detector.last_lips_aspect_ratio)
+
+        right_cheek = face_region[BlushingDetector.BlushingDetector.right_cheek_idx]
+        left_cheek = face_region[BlushingDetector.BlushingDetector.left_cheek_idx]
+        self.draw_cheeks(frame, right_cheek, left_cheek)
+        if blushing_detector.blushing_detected:
+            self.print_blushing(frame)
+        if blushing_detector.last_cheeks_color is not None:
+            self.show_cheeks(frame, right_cheek, left_cheek, blushing_detector.last_cheeks_color)
+
+        cv2.putText(frame, "A_EAR: {:.4f}".format(subject.person.eye_aspect_ratio), (200, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        cv2.putText(frame, "A_LAR: {:.4f}".format(subject.person.lips_aspect_ratio), (500, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+
+    def show_cheeks(self, frame, right_cheek, left_cheek, cheeks_color):
+        # show the cheeks filled with their measured average color
+        extracted_cheeks_frame = numpy.zeros(frame.shape, numpy.uint8)
+        cv2.drawContours(extracted_cheeks_frame, [right_cheek, left_cheek], -1, cheeks_color, -1)
+        cv2.putText(extracted_cheeks_frame, "BGR: {:.0f}".format(cheeks_color[0])
+                    + " {:.0f}".format(cheeks_color[1])
+                    + " {:.0f}".format(cheeks_color[2]), (150, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        cv2.imshow(self.cheeks_window_name, extracted_cheeks_frame)
+
+    @staticmethod
+    def draw_identity(frame, identity, face_region):
+        # label the face above its highest landmark, when several faces are analysed
+        x, y = face_region[:, 0].min(), face_region[:, 1].min()
+        cv2.putText(frame, "#{}".format(identity), (int(x), max(int(y) - 10, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+    @staticmethod
+    def draw_eyes(frame, left_eye, right_eye):
+        # compute the convex hull for the left and right eye and visualize each of the eyes
+        left_eye_hull = cv2.convexHull(left_eye)
+        right_eye_hull = cv2.convexHull(right_eye)
+        cv2.drawContours(frame, [left_eye_hull], -1, (0, 255, 0), 1)
+        cv2.drawContours(frame, [right_eye_hull], -1, (0, 255, 0), 1)
+
+    @staticmethod
+    def print_blinks(frame, blinks, EAR=-1):
+        # print the total number of blinks on the frame along with
+        # the computed eye aspect ratio for the frame
+        cv2.putText(frame, "Blinks: {}".format(blinks), (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        cv2.putText(frame, "EAR: {:.4f}".format(EAR), (200, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+    @staticmethod
+    def draw_mouth(frame, mouth_contour):
+        cv2.drawContours(frame, [mouth_contour], -1, (255, 255, 51), 1)
+
+    @staticmethod
+    def print_pursed_lips(frame, number, MAR=-1):
+        # print the total number of pursed lips on the frame along with
+        # the computed lips aspect ratio for the frame
+        cv2.putText(frame, "Pursed lips: {}".format(number), (400, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 2)
+        cv2.putText(frame, "LAR: {:.4f}".format(MAR), (500, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 2)
+
+    @staticmethod
+    def draw_cheeks(frame, right_cheek, left_cheek):
+        cv2.drawContours(frame, [right_cheek], -1, (255, 0, 0))
+        cv2.drawContours(frame, [left_cheek], -1, (200, 0, 0))
+
+    @staticmethod
+    def print_blushing(frame):
+        cv2.putText(frame, "BLUSHING", (150, 300),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
@@ -0,0 +1,110 @@
+"""
+ Headless batch processing of recorded interviews. Every video runs through its own LieDetector pipeline
+ in a process pool sized to the cores, and the per-question results are written to one csv per video.
+
+ The questions file is a json object mapping video file names to the times (seconds from the start of the video)
+ at which each of their questions ends, e.g. {"03.mp4": [12.5, 30.0, 41.2]}.
+
+ Run with: python batch.py ../dataset/*.mp4 --questions questions.json --output results
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import FaceTracker
+import LieDetector
+import Profiler
+
+RESULT_FIELDS = ["question", "subject", "seconds", "blinks", "blinks_per_second", "lip_pursing", "blushing",
+                 "probability", "prediction"]
+
+
+def process_video(video_path, question_times, algorithm, detection_interval=1, tracking="landmarks",
+                  detection_scale=1.0, landmark_cache_directory=None, metrics_path=None, max_faces=1):
+    start = time.time()
+    # the stage latencies are only measured when they are written somewhere
+    profiler = Profiler.Profiler(metrics_path) if metrics_path is not None else None
+    lie_detector = LieDetector.LieDetector(algorithm, video_path=video_path, question_times=question_times,
+                                           display=False, report_path=None, detection_interval=detection_interval,
+                                           tracking=tracking, detection_scale=detection_scale,
+                                           landmark_cache_directory=landmark_cache_directory, profiler=profiler,
+                                           max_faces=max_faces)
+    try:
+        results = lie_detector.process()
+    finally:
+        lie_detector.destroy()
+    return results, lie_detector.frame_counter, time.time() - start
+
+
+def write_results(results, output_path):
+    with open(output_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def load_question_times(questions_path):
+    if questions_path is None:
+        return {}
+    with open(questions_path, "r") as questions_file:
+        return json.load(questions_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse recorded interviews without a display.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--questions", help="json file with the end time of every question, per video file name")
+    parser.add_argument("--algorithm", choices=["knn", "ffnn"], default="knn")
+    parser.add_argument("--output", default="results", help="directory the per-question csv files are written to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--detection-interval", type=int, default=1,
+                        help="run the face detector every this many frames and track the face in between")
+    parser.add_argument("--tracking", choices=FaceTracker.TRACKING_MODES, default="landmarks")
+    parser.add_argument("--detection-scale", type=float, default=1.0,
+                        help="detect faces on a frame this many times smaller (e.g. 2-4)")
+    parser.add_argument("--max-faces", type=int, default=1,
+                        help="analyse up to this many faces of every video, each on its own, 0 analyses all of them")
+    parser.add_argument("--landmark-cache", metavar="DIRECTORY",
+                        help="replay videos analysed before from their landmarks cached in this directory, "
+                             "and cache the landmarks of the others there")
+    parser.add_argument("--profile", action="store_true",
+                        help="write the latency of every stage of the frame loop to a .metrics.json file per video")
+    args = parser.parse_args()
+
+    question_times = load_question_times(args.questions)
+    os.makedirs(args.output, exist_ok=True)
+
+    start = time.time()
+    total_frames = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {}
+        for video_path in args.videos:
+            times = question_times.get(os.path.basename(video_path), question_times.get(video_path))
+            metrics_path = None
+            if args.profile:
+                metrics_path = os.path.join(args.output, os.path.splitext(os.path.basename(video_path))[0]
+                                            + ".metrics.json")
+            futures[executor.submit(process_video, video_path, times, args.algorithm, args.detection_interval,
+                                    args.tracking, args.detection_scale, args.landmark_cache,
+                                    metrics_path, args.max_faces or None)] = video_path
+
+        for future in as_completed(futures):
+            video_path = futures[future]
+            results, frames, seconds = future.result()
+            total_frames += frames
+
+            output_path = os.path.join(args.output, os.path.splitext(os.path.basename(video_path))[0] + ".csv")
+            write_results(results, output_path)
+            print("[INFO] {}: {} questions, {} frames in {:.1f}s ({:.1f} fps)".format(
+                video_path, len(results), frames, seconds, frames / seconds if seconds > 0 else 0))
+
+    elapsed = time.time() - start
+    print("[INFO] Processed {} videos, {} frames in {:.1f}s, {:.1f} fps overall".format(
+        len(args.videos), total_frames, elapsed, total_frames / elapsed if elapsed > 0 else 0))
+
+
+if __name__ == "__main__":
+    main()
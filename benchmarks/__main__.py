@@ -0,0 +1,113 @@
+"""
+ Runs the benchmark suites and saves their results, with the commit and machine they ran on, as json; and compares
+ two such files, so a regression between commits shows up as a slower ratio.
+
+ Run with:   python -m benchmarks --output benchmarks.json
+ Compare:    python -m benchmarks --compare baseline.json benchmarks.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+import numpy as np
+
+from benchmarks import end_to_end, features, predictors
+
+SUITES = ("features", "predictors", "end_to_end")
+
+# metrics where a bigger value is better, and suffixes of latencies, where smaller is better;
+# other numbers (frame counts, detections) aren't compared
+HIGHER_IS_BETTER = ("fps", "questions_per_second")
+LATENCY_SUFFIXES = ("_ms", "_us")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine():
+    return {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+            "python": platform.python_version(), "numpy": np.__version__}
+
+
+def run(suites=SUITES, quick=False):
+    results = {"commit": git_commit(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+               "machine": machine(), "suites": {}}
+    for suite in suites:
+        print("[INFO] Running " + suite)
+        if suite == "features":
+            results["suites"][suite] = features.run(500 if quick else 2000)
+        elif suite == "predictors":
+            sizes = (1000, 10000) if quick else (1000, 10000, 100000)
+            results["suites"][suite] = predictors.run(sizes)
+        elif suite == "end_to_end":
+            results["suites"][suite] = end_to_end.run(frames=60 if quick else 150)
+    return results
+
+
+def flatten(results, prefix=""):
+    # numeric metrics of nested results as {"suite.case.metric": value}
+    metrics = {}
+    for name, value in results.items():
+        if isinstance(value, dict):
+            metrics.update(flatten(value, prefix + name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[prefix + name] = value
+    return metrics
+
+
+def compare(baseline, current, tolerance=0.1):
+    # prints every metric of both runs with how many times faster the current run is; returns the regressed metrics
+    baseline_metrics = flatten(baseline["suites"])
+    current_metrics = flatten(current["suites"])
+    print("baseline {} vs current {}".format(baseline.get("commit"), current.get("commit")))
+
+    regressions = []
+    for name in sorted(set(baseline_metrics) & set(current_metrics)):
+        metric = name.rsplit(".", 1)[-1]
+        before, after = baseline_metrics[name], current_metrics[name]
+        if before <= 0 or after <= 0 or not (metric in HIGHER_IS_BETTER or metric.endswith(LATENCY_SUFFIXES)):
+            continue
+        speedup = after / before if metric in HIGHER_IS_BETTER else before / after
+        regressed = speedup < 1 - tolerance
+        if regressed:
+            regressions.append(name)
+        print("{:<50} {:>12.4g} {:>12.4g} {:>7.2f}x{}".format(name, before, after, speedup,
+                                                            "  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suites and save the results as json.")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--output", default="benchmarks.json")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a quick check")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two saved results instead of running the suites")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="slowdown reported as a regression when comparing, 0.1 is 10%%")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], "r") as baseline_file, open(args.compare[1], "r") as current_file:
+            regressions = compare(json.load(baseline_file), json.load(current_file), args.tolerance)
+        if regressions:
+            print("[INFO] {} metrics regressed".format(len(regressions)))
+            raise SystemExit(1)
+        return
+
+    results = run(args.suites, args.quick)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print("[INFO] Saved results to " + args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+ Compares BlushingDetector.calculate_cheeks_color against the previous implementation, which drew each cheek
+ into a new full frame mask and averaged the whole frame.
+
+ Run with: python -m benchmarks.cheek_color --frames 2000
+"""
+import argparse
+import time
+
+import cv2
+import numpy
+
+import BlushingDetector
+from benchmarks import synthetic
+
+
+def full_frame_cheeks_color(frame, gray_frame, right_cheek, left_cheek):
+    # the implementation before masks were bounded to the cheeks, without its drawing
+    mask = numpy.zeros(gray_frame.shape, numpy.uint8)
+    cv2.drawContours(mask, [right_cheek], -1, 255, -1)
+    right_cheek_color = cv2.mean(frame, mask)
+
+    mask = numpy.zeros(gray_frame.shape, numpy.uint8)
+    cv2.drawContours(mask, [left_cheek], -1, 255, -1)
+    left_cheek_color = cv2.mean(frame, mask)
+
+    return [(left_cheek_color[0] + right_cheek_color[0]) / 2,
+            (left_cheek_color[1] + right_cheek_color[1]) / 2,
+            (left_cheek_color[2] + right_cheek_color[2]) / 2]
+
+
+def benchmark(frames, width, height):
+    frame = synthetic.frame(width, height)
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    face_region = synthetic.face_region()
+    right_cheek = face_region[BlushingDetector.BlushingDetector.right_cheek_idx]
+    left_cheek = face_region[BlushingDetector.BlushingDetector.left_cheek_idx]
+    blushing_detector = BlushingDetector.BlushingDetector()
+
+    expected = full_frame_cheeks_color(frame, gray_frame, right_cheek, left_cheek)
+    actual = blushing_detector.calculate_cheeks_color(frame, right_cheek, left_cheek)
+    if not numpy.allclose(expected, actual):
+        raise AssertionError("cheek colors differ: " + repr(expected) + " " + repr(actual))
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        full_frame_cheeks_color(frame, gray_frame, right_cheek, left_cheek)
+    full_frame_time = (time.perf_counter() - start) / frames
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        blushing_detector.calculate_cheeks_color(frame, right_cheek, left_cheek)
+    bounded_time = (time.perf_counter() - start) / frames
+
+    return full_frame_time, bounded_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cheek color computation per frame.")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    args = parser.parse_args()
+
+    full_frame_time, bounded_time = benchmark(args.frames, args.width, args.height)
+    print("full frame masks: {:.1f} us per frame".format(full_frame_time * 1e6))
+    print("bounded masks:    {:.1f} us per frame ({:.1f}x faster)".format(bounded_time * 1e6,
+                                                                        full_frame_time / bounded_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+ Speed against landmark accuracy of detecting faces on downscaled frames. For every sampled frame of the given
+ videos, faces are detected at each scale and landmarks predicted on the full resolution frame; the landmarks are
+ compared with the ones found from full resolution detection.
+
+ Needs dlib and shape_predictor_68_face_landmarks.dat. Run with:
+ python -m benchmarks.detection_scale ../dataset/*.mp4 --scales 1 2 3 4
+"""
+import argparse
+import time
+
+import cv2
+import dlib
+import imutils
+import numpy as np
+from imutils import face_utils
+
+import FaceTracker
+import LieDetector
+
+
+def sample_frames(video_path, frames, step):
+    video = cv2.VideoCapture(video_path)
+    sampled = []
+    index = 0
+    while len(sampled) < frames:
+        grabbed, frame = video.read()
+        if not grabbed:
+            break
+        if index % step == 0:
+            frame = imutils.resize(frame, width=800)
+            sampled.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        index += 1
+    video.release()
+    return sampled
+
+
+def benchmark(gray_frames, scales):
+    detector = dlib.get_frontal_face_detector()
+    predictor = dlib.shape_predictor(LieDetector.SHAPE_PREDICTOR_PATH)
+
+    results = {}
+    for scale in scales:
+        face_tracker = FaceTracker.FaceTracker(detector, detection_scale=scale)
+        landmarks = []
+        start = time.perf_counter()
+        faces = [face_tracker.detect_faces(gray_frame) for gray_frame in gray_frames]
+        detection_time = (time.perf_counter() - start) / len(gray_frames)
+
+        for gray_frame, frame_faces in zip(gray_frames, faces):
+            if frame_faces:
+                landmarks.append(face_utils.shape_to_np(predictor(gray_frame, frame_faces[0])))
+            else:
+                landmarks.append(None)
+        results[scale] = (detection_time, landmarks)
+
+    reference = results[scales[0]][1]
+    report = []
+    for scale in scales:
+        detection_time, landmarks = results[scale]
+        errors = [np.linalg.norm(found - expected, axis=1).mean()
+                  for found, expected in zip(landmarks, reference) if found is not None and expected is not None]
+        found_faces = sum(found is not None for found in landmarks)
+        report.append((scale, detection_time, found_faces / float(len(landmarks)),
+                       np.mean(errors) if errors else float("nan"), np.max(errors) if errors else float("nan")))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detection on downscaled frames.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--frames", type=int, default=200, help="frames sampled per video")
+    parser.add_argument("--step", type=int, default=5, help="sample every this many frames")
+    args = parser.parse_args()
+
+    gray_frames = []
+    for video_path in args.videos:
+        gray_frames += sample_frames(video_path, args.frames, args.step)
+
+    print("{:>6} {:>14} {:>12} {:>18} {:>17}".format("scale", "detection ms", "faces found", "mean landmark px",
+                                                      "max landmark px"))
+    for scale, detection_time, found, mean_error, max_error in benchmark(gray_frames, args.scales):
+        print("{:>6} {:>14.2f} {:>12.1%} {:>18.2f} {:>17.2f}".format(scale, detection_time * 1000, found, mean_error,
+                                                                     max_error))
+
+
+if __name__ == "__main__":
+    main()
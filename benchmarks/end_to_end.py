@@ -0,0 +1,68 @@
+"""
+ End-to-end frame rate of LieDetector on a short generated video (or a sample video), headless, with the
+ latency of every stage from the profiler.
+
+ Needs dlib and shape_predictor_68_face_landmarks.dat. Run with: python -m benchmarks.end_to_end --frames 150
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+
+
+def run(video_path=None, frames=150, algorithm="knn", detection_interval=1):
+    # returns the frame rate and per stage latencies, or why the run was skipped
+    try:
+        import LieDetector
+        import Profiler
+    except ImportError as error:
+        return {"skipped": str(error)}
+    if not os.path.exists(LieDetector.SHAPE_PREDICTOR_PATH):
+        return {"skipped": LieDetector.SHAPE_PREDICTOR_PATH + " not found"}
+
+    directory = None
+    if video_path is None:
+        directory = tempfile.mkdtemp()
+        video_path = synthetic.write_video(os.path.join(directory, "synthetic.avi"), frames)
+
+    try:
+        profiler = Profiler.Profiler()
+        lie_detector = LieDetector.LieDetector(algorithm, video_path=video_path, display=False, report_path=None,
+                                               detection_interval=detection_interval, profiler=profiler)
+        start = time.perf_counter()
+        try:
+            lie_detector.process()
+        finally:
+            lie_detector.destroy()
+        elapsed = time.perf_counter() - start
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory)
+
+    snapshot = profiler.snapshot()
+    return {
+        "frames": lie_detector.frame_counter,
+        "fps": lie_detector.frame_counter / elapsed if elapsed > 0 else 0.0,
+        "face_detections": lie_detector.face_tracker.detections,
+        "stages": {stage: {name: metrics[name] for name in ("mean_ms", "p50_ms", "p95_ms", "p99_ms")}
+                   for stage, metrics in snapshot["stages"].items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LieDetector end to end on a video.")
+    parser.add_argument("--video", help="sample video to analyse instead of a generated one")
+    parser.add_argument("--frames", type=int, default=150, help="length of the generated video")
+    parser.add_argument("--algorithm", choices=["knn", "ffnn"], default="knn")
+    parser.add_argument("--detection-interval", type=int, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.video, args.frames, args.algorithm, args.detection_interval), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+ Per-frame cost of the feature detectors on synthetic frames and landmarks: BlinkDetector.detect,
+ PursedLipsDetector.detect and BlushingDetector.calculate_cheeks_color, as LieDetector calls them on every frame,
+ and the vectorized geometry and event detection over a whole recorded session.
+
+ Run with: python -m benchmarks.features --frames 2000
+"""
+import argparse
+
+import BlinkDetector
+import BlushingDetector
+import PursedLipsDetector
+import event_detection
+import landmark_geometry
+from benchmarks import synthetic
+from benchmarks.timing import measure
+
+
+def run(frames=2000):
+    # microseconds per frame of every feature
+    stream = synthetic.landmark_stream(frames).astype(int)
+    frame = synthetic.frame()
+
+    blink_detector = BlinkDetector.BlinkDetector()
+    blink_detector.calculate_eye_aspect_ratio_threshold(0.25)
+    pursed_lips_detector = PursedLipsDetector.PursedLipsDetector()
+    pursed_lips_detector.calculate_lips_aspect_ratio_threshold(0.3)
+    blushing_detector = BlushingDetector.BlushingDetector()
+    right_cheek = stream[0][BlushingDetector.BlushingDetector.right_cheek_idx]
+    left_cheek = stream[0][BlushingDetector.BlushingDetector.left_cheek_idx]
+
+    def detect_all(detector):
+        for face_region in stream:
+            detector.detect(face_region)
+
+    def session_events():
+        eye_aspect_ratios, lips_aspect_ratios, _ = landmark_geometry.calculate_features(stream)
+        event_detection.threshold_events(eye_aspect_ratios, 0.25, 1)
+        event_detection.threshold_events(lips_aspect_ratios, 0.3, 4)
+
+    return {
+        "blink_detect_us": 1e6 * measure(lambda: detect_all(blink_detector), 1) / frames,
+        "pursed_lips_detect_us": 1e6 * measure(lambda: detect_all(pursed_lips_detector), 1) / frames,
+        "cheeks_color_us": 1e6 * measure(
+            lambda: blushing_detector.calculate_cheeks_color(frame, right_cheek, left_cheek), frames),
+        "session_events_us": 1e6 * measure(session_events, 1) / frames,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-frame feature detectors.")
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, microseconds in run(args.frames).items():
+        print("{:>24} {:>10.2f} us per frame".format(name, microseconds))
+
+
+if __name__ == "__main__":
+    main()
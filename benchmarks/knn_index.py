@@ -0,0 +1,66 @@
+"""
+ Compares the kNN neighbour search backends on synthetic datasets shaped like datasetExtracted.csv
+ (average blinks, blinks per second, pursed lips, blushing, answer).
+
+ Run with: python -m benchmarks.knn_index --sizes 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+import kNN
+
+
+def synthetic_dataset(size, seed=0):
+    random = np.random.RandomState(seed)
+    dataset = np.empty((size, 5), dtype=np.float32)
+    dataset[:, 0] = random.uniform(0, 1, size)
+    dataset[:, 1] = random.uniform(0, 1, size)
+    dataset[:, 2] = random.randint(0, 6, size)
+    dataset[:, 3] = random.randint(0, 4, size)
+    dataset[:, 4] = random.randint(0, 2, size)
+    return dataset
+
+
+def benchmark(size, queries, k, backends):
+    dataset = synthetic_dataset(size)
+    to_predict = synthetic_dataset(queries, seed=1)[:, :4]
+    results = []
+
+    for backend in backends:
+        start = time.perf_counter()
+        classifier = kNN.KNNClassifier(k, backend).fit(dataset)
+        build_time = time.perf_counter() - start
+
+        # a single question, as LieDetector asks it
+        start = time.perf_counter()
+        for instance in to_predict[:20]:
+            classifier.predict([instance])
+        single_latency = (time.perf_counter() - start) / 20
+
+        start = time.perf_counter()
+        classifier.predict(to_predict)
+        batch_time = time.perf_counter() - start
+
+        results.append((backend, build_time, single_latency, queries / batch_time))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kNN index backends against the brute-force scan.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=12)
+    parser.add_argument("--backends", nargs="+", default=list(kNN.INDEX_BACKENDS))
+    args = parser.parse_args()
+
+    print("{:>9} {:>10} {:>10} {:>14} {:>14}".format("rows", "backend", "build s", "latency ms", "queries/s"))
+    for size in args.sizes:
+        for backend, build_time, single_latency, throughput in benchmark(size, args.queries, args.k, args.backends):
+            print("{:>9} {:>10} {:>10.3f} {:>14.3f} {:>14.0f}".format(size, backend, build_time,
+                                                                     single_latency * 1000, throughput))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+ Measures prediction.predict_batch throughput for growing batch sizes, against classifying the same
+ questions one call at a time the way LieDetector.detect_if_lie does.
+
+ Run with: python -m benchmarks.predict_batch --algorithms knn ffnn
+"""
+import argparse
+import time
+
+import prediction
+from benchmarks.knn_index import synthetic_dataset
+
+
+def benchmark(algorithm, batch_size, data_set_path):
+    features = synthetic_dataset(batch_size, seed=1)[:, :4]
+    # warm up the model cache so loading isn't measured
+    prediction.predict_batch(features[:1], algorithm, data_set_path)
+
+    start = time.perf_counter()
+    prediction.predict_batch(features, algorithm, data_set_path)
+    batch_time = time.perf_counter() - start
+
+    single_questions = min(batch_size, 100)
+    start = time.perf_counter()
+    for question in features[:single_questions]:
+        prediction.predict_batch([question], algorithm, data_set_path)
+    single_time = (time.perf_counter() - start) / single_questions
+
+    return batch_size / batch_time, 1 / single_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched prediction throughput.")
+    parser.add_argument("--algorithms", nargs="+", default=["knn"], choices=prediction.ALGORITHMS)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000, 10000, 100000])
+    parser.add_argument("--dataset", default=prediction.DATASET_PATH)
+    args = parser.parse_args()
+
+    print("{:>10} {:>10} {:>16} {:>16}".format("algorithm", "batch", "batched q/s", "one by one q/s"))
+    for algorithm in args.algorithms:
+        for batch_size in args.batch_sizes:
+            batched, one_by_one = benchmark(algorithm, batch_size, args.dataset)
+            print("{:>10} {:>10} {:>16.0f} {:>16.0f}".format(algorithm, batch_size, batched, one_by_one))
+
+
+if __name__ == "__main__":
+    main()
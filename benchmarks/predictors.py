@@ -0,0 +1,61 @@
+"""
+ Latency of one question and throughput of a batch of questions for both predictors: kNN.predict at growing
+ (synthetic) dataset sizes, and feedforward_nn.predict with the saved network at growing batch sizes.
+
+ Run with: python -m benchmarks.predictors --sizes 1000 10000 100000
+"""
+import argparse
+
+import feedforward_nn
+import kNN
+from benchmarks.knn_index import synthetic_dataset
+from benchmarks.timing import measure
+
+
+def knn(sizes=(1000, 10000, 100000), queries=1000, k=12, backends=("brute", "kd_tree")):
+    results = {}
+    to_predict = synthetic_dataset(queries, seed=1)[:, :4]
+    for size in sizes:
+        dataset = synthetic_dataset(size)
+        for backend in backends:
+            classifier = kNN.KNNClassifier(k, backend).fit(dataset)
+            results["{}_{}".format(backend, size)] = {
+                "latency_ms": 1000 * measure(lambda: classifier.predict(to_predict[:1]), 20),
+                "questions_per_second": queries / measure(lambda: classifier.predict(to_predict), 1),
+            }
+    return results
+
+
+def ffnn(batch_sizes=(1, 100, 10000), model_path=feedforward_nn.MODEL_PATH):
+    # runs on model.npz while it matches model.h5, like LieDetector does
+    model = feedforward_nn.get_model(model_path)
+    results = {"backend": type(model).__name__}
+    for batch_size in batch_sizes:
+        features = synthetic_dataset(batch_size, seed=1)[:, :4]
+        seconds = measure(lambda: feedforward_nn.predict(features, model), max(1, 1000 // batch_size))
+        results["batch_{}".format(batch_size)] = {"latency_ms": 1000 * seconds,
+                                                  "questions_per_second": batch_size / seconds}
+    return results
+
+
+def run(sizes=(1000, 10000, 100000), batch_sizes=(1, 100, 10000)):
+    return {"knn": knn(sizes), "ffnn": ffnn(batch_sizes)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kNN and feedforward network predictions.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10000])
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.batch_sizes)
+    print("{:>8} {:>18} {:>12} {:>16}".format("model", "case", "latency ms", "questions/s"))
+    for model in ("knn", "ffnn"):
+        for case, metrics in results[model].items():
+            if isinstance(metrics, dict):
+                print("{:>8} {:>18} {:>12.3f} {:>16.0f}".format(model, case, metrics["latency_ms"],
+                                                               metrics["questions_per_second"]))
+
+
+if __name__ == "__main__":
+    main()
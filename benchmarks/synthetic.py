@@ -0,0 +1,87 @@
+"""
+ Synthetic inputs for the benchmarks: a 68 point face landmark template in dlib's layout,
+ frames with a face-like colored region, and landmark streams with blinks and lip pursing.
+"""
+import math
+
+import cv2
+import numpy as np
+
+
+def landmark_template(eye_openness=1.0, mouth_openness=1.0):
+    # 68 (x, y) points in the unit square, ordered as dlib's shape_predictor_68_face_landmarks
+    points = []
+    # jaw
+    for i in range(17):
+        angle = math.pi * i / 16.0
+        points.append((0.5 - 0.5 * math.cos(angle), 0.3 + 0.6 * math.sin(angle)))
+    # eyebrows
+    for i in range(10):
+        points.append((0.15 + 0.07 * i + (0.06 if i >= 5 else 0), 0.2))
+    # nose bridge and nostrils
+    for i in range(4):
+        points.append((0.5, 0.3 + 0.08 * i))
+    for i in range(5):
+        points.append((0.4 + 0.05 * i, 0.6))
+    # right and left eye
+    for center in (0.3, 0.7):
+        height = 0.04 * eye_openness
+        points += [(center - 0.08, 0.35), (center - 0.03, 0.35 - height), (center + 0.03, 0.35 - height),
+                   (center + 0.08, 0.35), (center + 0.03, 0.35 + height), (center - 0.03, 0.35 + height)]
+    # outer and inner lips
+    lip = 0.05 * mouth_openness
+    points += [(0.3, 0.75), (0.37, 0.75 - lip), (0.44, 0.75 - lip * 1.2), (0.5, 0.75 - lip * 1.1),
+               (0.56, 0.75 - lip * 1.2), (0.63, 0.75 - lip), (0.7, 0.75), (0.63, 0.75 + lip),
+               (0.56, 0.75 + lip * 1.3), (0.5, 0.75 + lip * 1.3), (0.44, 0.75 + lip * 1.3), (0.37, 0.75 + lip)]
+    points += [(0.33, 0.75), (0.44, 0.75 - lip * 0.3), (0.5, 0.75 - lip * 0.3), (0.56, 0.75 - lip * 0.3),
+               (0.67, 0.75), (0.56, 0.75 + lip * 0.3), (0.5, 0.75 + lip * 0.3), (0.44, 0.75 + lip * 0.3)]
+    return np.array(points)
+
+
+def face_region(box=(250, 150, 300, 300), eye_openness=1.0, mouth_openness=1.0):
+    # landmarks of a face in the (left, top, width, height) box, as LieDetector gets them from shape_to_np
+    left, top, width, height = box
+    points = landmark_template(eye_openness, mouth_openness) * (width, height) + (left, top)
+    return points.astype(int)
+
+
+def frame(width=800, height=600, box=(250, 150, 300, 300), seed=0):
+    # a noisy background with a skin colored face in the box
+    random = np.random.RandomState(seed)
+    image = random.randint(0, 60, (height, width, 3)).astype(np.uint8)
+    left, top, box_width, box_height = box
+    image[top:top + box_height, left:left + box_width] = (110, 130, 180)
+    image[top:top + box_height, left:left + box_width] += random.randint(0, 20, (box_height, box_width, 3)).astype(
+        np.uint8)
+    return image
+
+
+def landmark_stream(frames, blink_every=40, blink_length=3, pursing_every=90, pursing_length=6, seed=0):
+    # (frames, 68, 2) landmarks of a face that blinks and purses its lips periodically, with some jitter
+    random = np.random.RandomState(seed)
+    stream = np.empty((frames, 68, 2))
+    for i in range(frames):
+        eye_openness = 0.2 if i % blink_every < blink_length else 1.0
+        mouth_openness = 0.3 if i % pursing_every < pursing_length else 1.0
+        stream[i] = face_region(eye_openness=eye_openness, mouth_openness=mouth_openness)
+    stream += random.normal(0, 0.3, stream.shape)
+    return stream
+
+
+def write_video(video_path, frames=150, fps=30.0, width=800, height=600, seed=0):
+    # a short video of the synthetic face drifting across the frame while it blinks and purses its lips,
+    # with the landmark contours drawn so the face has some structure for a detector to find
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    stream = landmark_stream(frames, seed=seed)
+    try:
+        for i in range(frames):
+            offset = int(40 * math.sin(2 * math.pi * i / frames))
+            image = frame(width, height, box=(250 + offset, 150, 300, 300), seed=seed + i)
+            points = (stream[i] + (offset, 0)).astype(np.int32)
+            # jaw, eyebrows and nose as open lines, eyes and lips closed
+            for start, end in ((0, 17), (17, 22), (22, 27), (27, 36), (36, 42), (42, 48), (48, 60), (60, 68)):
+                cv2.polylines(image, [points[start:end]], start >= 36, (40, 40, 60), 2)
+            writer.write(image)
+    finally:
+        writer.release()
+    return video_path
@@ -0,0 +1,19 @@
+"""
+ Timing shared by the benchmarks: every measurement is repeated and the median kept, so one slow repeat
+ (another process waking up, a page fault) doesn't shift the result.
+"""
+import time
+
+REPEATS = 5
+
+
+def measure(function, number, repeats=REPEATS):
+    # median seconds per call of function over repeats runs of number calls
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    return times[len(times) // 2]
@@ -0,0 +1,104 @@
+"""
+ Blink, lip pursing and blushing events found over whole per-frame feature series at once, for re-scoring
+ recorded sessions with other thresholds without replaying every frame through the detectors.
+
+ The counts are exactly those of BlinkDetector, PursedLipsDetector and BlushingDetector fed the same frames.
+ Every function also takes and returns the detector's frame counter, so a series can be processed in parts
+ (e.g. one question at a time, where the live detectors also keep their counter between questions).
+"""
+import numpy as np
+
+import BlushingDetector
+
+
+def threshold_events(values, threshold, consecutive_frames, frame_counter=0):
+    # events of BlinkDetector / PursedLipsDetector: a run of frames below the threshold counts once a frame
+    # at or above the threshold ends it, if the run was at least consecutive_frames long. A run still open
+    # at the end of the series isn't counted yet, its length is returned as the new frame counter.
+    # Returns the [start, end) frame intervals of the events and the frame counter; starts are negative
+    # for a run carried in from a previous part
+    values = np.asarray(values, dtype=np.float64)
+    # written as "not below" so NaN ends a run like it does in the detectors
+    ending_frames = np.flatnonzero(~(values < threshold))
+
+    if len(ending_frames) == 0:
+        return np.empty((0, 2), dtype=np.int64), frame_counter + len(values)
+
+    previous_ending_frames = np.empty_like(ending_frames)
+    previous_ending_frames[0] = -1 - frame_counter
+    previous_ending_frames[1:] = ending_frames[:-1]
+    run_lengths = ending_frames - previous_ending_frames - 1
+
+    counted = run_lengths >= consecutive_frames
+    intervals = np.column_stack((ending_frames[counted] - run_lengths[counted], ending_frames[counted]))
+    return intervals, len(values) - 1 - ending_frames[-1]
+
+
+def blushing_frames(cheek_colors, average_cheek_color, detector=BlushingDetector.BlushingDetector):
+    # BlushingDetector.is_blushing for an (F, 3) series of BGR cheek colors, with the color change allowances
+    # of the given detector (or of the BlushingDetector class)
+    cheek_colors = np.asarray(cheek_colors, dtype=np.float64)[:, :3]
+    changes = np.abs(cheek_colors - np.asarray(average_cheek_color, dtype=np.float64)[:3])
+    blue_change, green_change, red_change = changes[:, 0], changes[:, 1], changes[:, 2]
+
+    return (changes.sum(axis=1) > detector.RGB_CHANGE_ALLOWANCE) \
+        & (10 < red_change) & (red_change < detector.RED_CHANGE_ALLOWANCE) \
+        & (0 < green_change) & (green_change < detector.GREEN_CHANGE_ALLOWANCE) \
+        & (0 < blue_change) & (blue_change < detector.BLUE_CHANGE_ALLOWANCE)
+
+
+def blushing_events(blushing, consecutive_frames=50, frame_counter=0):
+    # events of BlushingDetector from a boolean series of blushing frames: the counter adds every blushing
+    # frame, fires and restarts when it reaches consecutive_frames, and a frame without blushing resets it
+    # only while it is below BLUSHING_TOLERATED_FRAMES. Between resets the state only changes at the edges of
+    # blushing runs, so the runs are found with numpy and only they (not the frames) are stepped through.
+    # Returns the [start, end) intervals of the events, ending at the frame that fired, and the frame counter
+    blushing = np.asarray(blushing, dtype=bool)
+    if consecutive_frames <= 0:
+        # the counter reaches the limit on every frame
+        frames = np.arange(len(blushing))
+        return np.column_stack((frames, frames + 1)), 0
+
+    tolerated_frames = BlushingDetector.BlushingDetector.BLUSHING_TOLERATED_FRAMES
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], blushing, [False])).astype(np.int8)))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+
+    starts, ends = [], []
+    position = 0
+    # first frame of the counted frames, for the interval of the next event
+    counting_since = -frame_counter
+    for run_start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+        # non-blushing frames before this run reset a small counter
+        if run_start > position and frame_counter < tolerated_frames:
+            frame_counter = 0
+        if frame_counter == 0:
+            counting_since = run_start
+
+        # every consecutive_frames counted frames fire an event and restart the counter
+        first_event = run_start + consecutive_frames - frame_counter - 1
+        for event in range(first_event, run_end, consecutive_frames):
+            starts.append(counting_since)
+            ends.append(event + 1)
+            counting_since = event + 1
+        frame_counter = (frame_counter + run_end - run_start) % consecutive_frames
+        position = run_end
+
+    if position < len(blushing) and frame_counter < tolerated_frames:
+        frame_counter = 0
+    return np.array([starts, ends], dtype=np.int64).reshape(2, -1).T, frame_counter
+
+
+def count_events(eye_aspect_ratios, lips_aspect_ratios, cheek_colors, blink_detector, pursed_lips_detector,
+                 blushing_detector):
+    # number of blinks, lip pursing and blushing the given (calibrated) detectors would count over the series,
+    # starting from their current frame counters
+    blinks, _ = threshold_events(eye_aspect_ratios, blink_detector.EYE_ASPECT_RATIO_THRESHOLD,
+                                 blink_detector.BLINK_CONSECUTIVE_FRAMES, blink_detector.frame_blink_counter)
+    lip_pursing, _ = threshold_events(lips_aspect_ratios, pursed_lips_detector.LIPS_ASPECT_RATIO_THRESHOLD,
+                                      pursed_lips_detector.PURSED_LIPS_CONSECUTIVE_FRAMES,
+                                      pursed_lips_detector.frame_pursed_counter)
+    blushing, _ = blushing_events(blushing_frames(cheek_colors, blushing_detector.AVERAGE_CHEEK_COLOR,
+                                                  blushing_detector),
+                                  blushing_detector.BLUSHING_CONSECUTIVE_FRAMES,
+                                  blushing_detector.blushing_frame_counter)
+    return len(blinks), len(lip_pursing), len(blushing)
@@ -1,13 +1,22 @@
-import pandas
-from keras import optimizers
-from keras.layers import Dense, Activation
-from keras.models import Sequential
-from keras.models import model_from_json
-from sklearn import model_selection
+import argparse
+import hashlib
+import json
+import os
+import threading
+
 import numpy as np
 
+# keras, pandas and sklearn are imported inside the functions that need them,
+# so importing this module (e.g. from LieDetector running kNN) stays cheap
+
+DATASET_PATH = "files/datasetExtracted.csv"
+MODEL_PATH = "model"
+
 
 def load_data(file_name, training=False):
+    import pandas
+    from sklearn import model_selection
+
     data = pandas.read_csv(file_name)
     target = data['answer']
     data = data.drop('answer', axis=1)
@@ -28,58 +37,278 @@ def load_data(file_name, training=False):
     return data, target
 
 
-def fit(x_train, y_train):
-    model = Sequential()
-    model.add(Dense(100, input_dim=4, init="uniform",
-                    activation="relu"))
-    model.add(Dense(1))
-    model.add(Activation("sigmoid"))
+def import_keras():
+    # the models here are saved by keras 2, which keras 3 can't load; with keras 3 installed the keras 2 API
+    # comes from tf_keras, when it is there
+    import keras
+    if int(keras.__version__.split(".")[0]) >= 3:
+        try:
+            import tf_keras as keras
+        except ImportError:
+            pass
+    return keras
+
+
+def fit(x_train, y_train, epochs=500):
+    keras = import_keras()
+
+    model = keras.models.Sequential()
+    model.add(keras.layers.Dense(100, input_dim=4, init="uniform",
+                                 activation="relu"))
+    model.add(keras.layers.Dense(1))
+    model.add(keras.layers.Activation("sigmoid"))
 
-    model.compile(optimizer=optimizers.SGD(lr=0.1, momentum=0.9),
+    model.compile(optimizer=keras.optimizers.SGD(lr=0.1, momentum=0.9),
                   loss='binary_crossentropy',
                   metrics=['accuracy'])
 
-    model.fit(x_train, y_train, epochs=500)
+    model.fit(x_train, y_train, epochs=epochs)
     return model
 
 
-def evaluate(x_test, y_test, model, file_name="model"):
-    score = model.evaluate(x_test, y_test)
+def evaluate(x_test, y_test, model):
+    # the model needs to be compiled to be evaluated, which a model loaded from disk isn't
+    if not getattr(model, "optimizer", None):
+        model.compile(optimizer="sgd", loss='binary_crossentropy', metrics=['accuracy'])
+    return model.evaluate(x_test, y_test)
+
+
+def save_model(model, file_name=MODEL_PATH):
     model_json = model.to_json()
     with open(file_name + ".json", "w") as json_file:
         json_file.write(model_json)
     model.save_weights(file_name + ".h5")
     print("[INFO] Saved model to disk")
 
-    return score
 
+def load_model(file_name=MODEL_PATH):
+    keras = import_keras()
 
-def load_model(file_name="model"):
-    json_file = open(file_name+".json", 'r')
+    json_file = open(file_name + ".json", 'r')
     loaded_model_json = json_file.read()
     json_file.close()
-    loaded_model = model_from_json(loaded_model_json)
+    loaded_model = keras.models.model_from_json(loaded_model_json)
     # load weights into new model
     loaded_model.load_weights(file_name + ".h5")
     print("[INFO] Loaded model from disk")
     return loaded_model
 
 
+"""
+ Pure NumPy inference for a saved Sequential model of Dense/Activation layers. The weights are exported once
+ from model.h5 into a small .npz, which can then be run without importing keras or tensorflow. The .npz keeps the
+ sha1 of the model.json and model.h5 it was exported from, so it's only used while it matches them.
+"""
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    # written with tanh so large negative inputs don't overflow exp
+    "sigmoid": lambda x: 0.5 * (1 + np.tanh(0.5 * x)),
+    "tanh": np.tanh,
+    "softmax": lambda x: np.exp(x - x.max(axis=1, keepdims=True)) /
+                         np.exp(x - x.max(axis=1, keepdims=True)).sum(axis=1, keepdims=True),
+}
+
+
+class NumpyModel:
+
+    def __init__(self, kernels, biases, activations):
+        self.kernels = kernels
+        self.biases = biases
+        self.activations = activations
+
+    def predict(self, data, batch_size=None):
+        # same call signature as a keras model's predict, so both can be used interchangeably
+        output = np.asarray(data, dtype=np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            output = ACTIVATIONS[activation](output @ kernel + bias)
+        return output
+
+
+def model_hash(file_name=MODEL_PATH, chunk_size=2 ** 20):
+    # sha1 of the keras model's structure and weights
+    sha1 = hashlib.sha1()
+    for extension in (".json", ".h5"):
+        with open(file_name + extension, "rb") as model_file:
+            for chunk in iter(lambda: model_file.read(chunk_size), b""):
+                sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def export_npz(file_name=MODEL_PATH, output=None):
+    # reads the layer structure from model.json and the weights straight from model.h5 with h5py,
+    # so exporting doesn't need keras either
+    import h5py
+
+    with open(file_name + ".json", 'r') as json_file:
+        layers = json.load(json_file)["config"]
+    # keras 2.2 stores the layer list directly as the config, newer versions under "layers"
+    if isinstance(layers, dict):
+        layers = layers["layers"]
+
+    kernels, biases, activations = [], [], []
+    with h5py.File(file_name + ".h5", 'r') as weights_file:
+        # weights saved from a whole model (model.save) are nested under model_weights
+        if "model_weights" in weights_file:
+            weights_file = weights_file["model_weights"]
+
+        for layer in layers:
+            config = layer["config"]
+            if layer["class_name"] == "Dense":
+                group = weights_file[config["name"]]
+                weights = [group[name] for name in group.attrs["weight_names"]]
+                kernels.append(np.asarray(weights[0], dtype=np.float32))
+                if config.get("use_bias", True):
+                    biases.append(np.asarray(weights[1], dtype=np.float32))
+                else:
+                    biases.append(np.zeros(kernels[-1].shape[1], dtype=np.float32))
+                activations.append(config.get("activation", "linear"))
+            elif layer["class_name"] == "Activation" and activations and activations[-1] == "linear":
+                # a linear Dense followed by an Activation layer is a Dense with that activation
+                activations[-1] = config["activation"]
+            else:
+                raise ValueError("Can't export layer " + layer["class_name"] + " to numpy")
+
+    arrays = {"activations": np.array(activations), "source_hash": np.array(model_hash(file_name))}
+    for i in range(len(kernels)):
+        arrays["kernel_" + str(i)] = kernels[i]
+        arrays["bias_" + str(i)] = biases[i]
+    np.savez(output or file_name, **arrays)
+    print("[INFO] Exported model to " + (output or file_name) + ".npz")
+
+
+def load_numpy_model(file_name=MODEL_PATH):
+    with np.load(file_name + ".npz") as arrays:
+        activations = [str(activation) for activation in arrays["activations"]]
+        kernels = [arrays["kernel_" + str(i)] for i in range(len(activations))]
+        biases = [arrays["bias_" + str(i)] for i in range(len(activations))]
+    print("[INFO] Loaded numpy model from disk")
+    return NumpyModel(kernels, biases, activations)
+
+
+def check_parity(file_name=MODEL_PATH, numpy_file_name=None, samples=1000, tolerance=1e-5):
+    # compares the numpy forward pass against keras on random inputs spanning the dataset's ranges
+    random = np.random.RandomState(0)
+    data = np.column_stack((random.uniform(0, 2, samples), random.uniform(0, 2, samples),
+                            random.randint(0, 10, samples), random.randint(0, 10, samples))).astype(np.float32)
+
+    expected = load_model(file_name).predict(data)
+    actual = load_numpy_model(numpy_file_name or file_name).predict(data)
+    difference = float(np.max(np.abs(expected - actual)))
+    if difference > tolerance:
+        raise AssertionError("numpy model differs from keras by " + repr(difference))
+    print("[INFO] numpy and keras predictions match, max difference " + repr(difference))
+    return difference
+
+
+# process-wide cache of loaded models, keyed by model path and backend
+_model_registry = {}
+_model_registry_lock = threading.Lock()
+
+
+def _model_files_mtime(file_name):
+    return tuple(os.path.getmtime(file_name + extension) if os.path.exists(file_name + extension) else None
+                 for extension in (".json", ".h5", ".npz"))
+
+
+def _numpy_model_is_current(file_name=MODEL_PATH):
+    # whether the .npz was exported from the model.json and model.h5 that are on disk now
+    if not os.path.exists(file_name + ".npz"):
+        return False
+    with np.load(file_name + ".npz") as arrays:
+        source_hash = str(arrays["source_hash"]) if "source_hash" in arrays else None
+    return source_hash == model_hash(file_name)
+
+
+def get_model(file_name=MODEL_PATH, backend="auto"):
+    # return the cached model for this path, reloading it only if its files changed on disk since it was
+    # loaded. With the "auto" backend the exported .npz is used whenever it was exported from the current
+    # model.json and model.h5, and keras is only imported when it wasn't
+    key = (os.path.abspath(file_name), backend)
+    mtime = _model_files_mtime(file_name)
+    with _model_registry_lock:
+        cached = _model_registry.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        if backend == "auto":
+            backend = "numpy" if _numpy_model_is_current(file_name) else "keras"
+        if backend == "numpy":
+            model = load_numpy_model(file_name)
+        else:
+            model = load_model(file_name)
+        _model_registry[key] = (mtime, model)
+        return model
+
+
+def evict_model(file_name=None):
+    # drop the cached models of one path, or all of them if no path is given
+    with _model_registry_lock:
+        if file_name is None:
+            _model_registry.clear()
+        else:
+            path = os.path.abspath(file_name)
+            for key in [key for key in _model_registry if key[0] == path]:
+                del _model_registry[key]
+
+
 def predict(data, model=None):
     if model is None:
-        model = load_model()
+        model = get_model()
     prediction = model.predict(np.array(data))
     return prediction
 
-def main(training=False):
-    if training:
-        train_x, train_y, test_x, test_y = load_data("files/datasetExtracted.csv", training=True)
-        model = fit(train_x, train_y)
-        score = evaluate(test_x, test_y, model)
-        print(score)
-    else:
-        model = load_model()
-        print(predict(np.array([[0.6333, 0.6333, 2, 1]]), model))
+
+def train(dataset_path=DATASET_PATH, model_path=MODEL_PATH, epochs=500):
+    train_x, train_y, test_x, test_y = load_data(dataset_path, training=True)
+    model = fit(train_x, train_y, epochs)
+    score = evaluate(test_x, test_y, model)
+    print(score)
+    save_model(model, model_path)
+    export_npz(model_path)
+    evict_model(model_path)
+    return score
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train, evaluate and export the feedforward lie detection model.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    train_parser = subparsers.add_parser("train", help="fit a new model and save it to disk")
+    train_parser.add_argument("--dataset", default=DATASET_PATH)
+    train_parser.add_argument("--model", default=MODEL_PATH, help="model path without the .json/.h5 extension")
+    train_parser.add_argument("--epochs", type=int, default=500)
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="score a saved model on the held-out split")
+    evaluate_parser.add_argument("--dataset", default=DATASET_PATH)
+    evaluate_parser.add_argument("--model", default=MODEL_PATH)
+
+    export_parser = subparsers.add_parser("export", help="export the weights to .npz for inference without keras, "
+                                                         "or save a copy of the keras model under another path")
+    export_parser.add_argument("--model", default=MODEL_PATH)
+    export_parser.add_argument("--format", choices=["npz", "keras"], default="npz")
+    export_parser.add_argument("--output", help="output path without extension, defaults to the model path")
+    export_parser.add_argument("--verify", action="store_true",
+                               help="check the exported numpy model against keras predictions")
+
+    args = parser.parse_args()
+
+    if args.command == "train":
+        train(args.dataset, args.model, args.epochs)
+    elif args.command == "evaluate":
+        train_x, train_y, test_x, test_y = load_data(args.dataset, training=True)
+        print(evaluate(test_x, test_y, load_model(args.model)))
+    elif args.command == "export":
+        output = args.output or args.model
+        if args.format == "keras":
+            save_model(load_model(args.model), output)
+        else:
+            export_npz(args.model, output)
+            if args.verify:
+                check_parity(args.model, output)
 
 
-main(training=True)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
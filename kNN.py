@@ -1,44 +1,117 @@
 import csv
 import math
 import operator
-from random import shuffle
+import os
+import pickle
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# available neighbour search backends: a linear scan, or a spatial index built once over the training set
+INDEX_BACKENDS = ("brute", "kd_tree", "ball_tree")
+
+# datasets at least this large are cross validated on all cores
+CROSS_VALIDATION_PARALLEL_SIZE = 5000
+
+
+def cross_validation(dataset, max_k=None, n_jobs=None):
+    # leave-one-out accuracy of every k from 1 to max_k. Distances of every row to all the others are
+    # computed and sorted once, and the votes of all k come from cumulative vote counts along
+    # the sorted neighbours, so no row is ever removed from the dataset
+    cv_classifier = KNNClassifier().fit(dataset)
+    # the distances are computed from the float64 features, not the classifier's float32 copy, so that rows
+    # exactly as far apart tie exactly and are ordered like get_neighbors orders them
+    features = cv_classifier.exact_features
+    size = len(cv_classifier.features)
+    max_k = min(max_k or size - 2, size - 1)
+
+    # keep the (rows x max_k x classes) vote counts of one chunk around 64MB
+    chunk_size = max(1, 2 ** 24 // (max_k * len(cv_classifier.classes)))
+    chunks = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() if size >= CROSS_VALIDATION_PARALLEL_SIZE else 1
+
+    correct = np.zeros(max_k, dtype=np.int64)
+    if n_jobs == 1 or len(chunks) == 1:
+        for start, stop in chunks:
+            correct += count_correct_per_k(cv_classifier, features, start, stop, max_k)
+    else:
+        with ProcessPoolExecutor(n_jobs, initializer=_set_cross_validation_classifier,
+                                 initargs=(cv_classifier, features)) as executor:
+            futures = [executor.submit(_count_correct_per_k_in_worker, start, stop, max_k)
+                       for start, stop in chunks]
+            for future in futures:
+                correct += future.result()
+
+    accuracies = {}
+    for k in range(1, max_k + 1):
+        accuracies[k] = correct[k - 1] / float(size) * 100.0
+        print("k = %2d" % (k), " Tačnost: ", accuracies[k])
+
+    return accuracies
+
+
+def exact_distances(instances, features):
+    # Euclidean distances between instances and feature rows, broadcast over their leading axes, summed feature by
+    # feature in float64 like euclidean_distance does, so equal distances come out exactly equal
+    distances = np.zeros(np.broadcast_shapes(instances.shape[:-1], features.shape[:-1]))
+    for column in range(features.shape[-1]):
+        distances += (instances[..., column] - features[..., column]) ** 2
+    return np.sqrt(distances)
+
+
+def count_correct_per_k(cv_classifier, features, start, stop, max_k):
+    # number of rows in [start, stop) correctly classified by their k nearest other rows, for every k
+    distances = exact_distances(features[start:stop, None, :], features[None, :, :])
+    # a held-out row must not vote for itself
+    distances[np.arange(stop - start), np.arange(start, stop)] = np.inf
+
+    # stable sort keeps equally distant rows in training order, like get_neighbors
+    neighbors = np.argsort(distances, axis=1, kind='stable')[:, :max_k]
+    matches = cv_classifier.label_indexes[neighbors][:, :, None] == np.arange(len(cv_classifier.classes))
 
-training_set = []
-test_set = []
+    # votes of every class among the first k neighbours, and the position each class first appears at,
+    # which breaks ties the same way calculate_votes does
+    counts = np.cumsum(matches, axis=1, dtype=np.int32)
+    first_seen = np.where(matches.any(axis=1), matches.argmax(axis=1), max_k)
+    scores = counts * (max_k + 1) - first_seen[:, None, :]
+    predicted = scores.argmax(axis=2)
 
-def cross_validation():
-    for k in range(1, len(training_set) - 1):
-        acc = 0
-        for i in range(len(training_set)):
-            to_predict = training_set[i]
-            training_set.remove(to_predict)
-            predictions = fit([to_predict], training_set, k)
-            acc += calculate_accuracy([to_predict], predictions)
-            training_set.insert(i, to_predict)
+    actual = cv_classifier.label_indexes[start:stop, None]
+    return (predicted == actual).sum(axis=0)
 
-        print("k = %2d" % (k), " Tačnost: ", acc / len(training_set))
 
+_worker_classifier = None
+_worker_features = None
 
-def load_dataset(filename, training=False):
+
+def _set_cross_validation_classifier(cv_classifier, features):
+    global _worker_classifier, _worker_features
+    _worker_classifier = cv_classifier
+    _worker_features = features
+
+
+def _count_correct_per_k_in_worker(start, stop, max_k):
+    return count_correct_per_k(_worker_classifier, _worker_features, start, stop, max_k)
+
+
+def load_dataset(filename, training=False, seed=None):
+    # returns the training and test rows of the csv; the test set is only
+    # split off (from shuffled rows) when training
     with open(filename, 'rt') as csvfile:
         next(csv.reader(csvfile))
         lines = csv.reader(csvfile)
-        dataset = list(lines)
-
-        shuffle(dataset)
+        dataset = [[float(value) for value in line] for line in lines]
 
-        if training:
-            split = 0.8 * len(dataset)
-        else:
-            split = len(dataset)
+    if not training:
+        return dataset, []
 
-        for x in range(len(dataset)):
-            for y in range(4):
-                dataset[x][y] = float(dataset[x][y])
-            if len(training_set) <= split:
-                training_set.append(dataset[x])
-            else:
-                test_set.append(dataset[x])
+    random.Random(seed).shuffle(dataset)
+    split = int(0.8 * len(dataset)) + 1
+    return dataset[:split], dataset[split:]
 
 
 """
@@ -97,29 +170,275 @@ def calculate_accuracy(testSet, predictions):
     return (correct / float(len(testSet))) * 100.0
 
 
-def fit(to_predict, dataset, k):
-    predictions = []
-    for x in range(len(to_predict)):
-        neighbors = get_neighbors(dataset, to_predict[x], k)
-        result = calculate_votes(neighbors)
-        predictions.append(result)
+"""
+ Vectorized k nearest neighbours classifier. Keeps the training set as one float32 matrix and
+ classifies a whole batch of instances with a single matrix product instead of a Python loop per row.
+ The float32 distances only pick the candidates; the nearest of them are ranked by their exact float64
+ distances, so rows exactly as far apart tie exactly and the votes are the ones get_neighbors gives.
+"""
+
+# relative error allowed in the float32 squared distances when picking the candidate neighbours
+CANDIDATE_TOLERANCE = 1e-5
+
+
+class KNNClassifier:
+
+    def __init__(self, k=12, index="brute"):
+        if index not in INDEX_BACKENDS:
+            raise ValueError("Unknown kNN index '" + index + "', expected one of " + repr(INDEX_BACKENDS))
+        self.k = k
+        self.index = index
+
+        self.features = None
+        self.exact_features = None
+        self.labels = None
+        self.tree = None
+
+    def fit(self, dataset, tree=None):
+        # every row of the dataset holds the features followed by the class label. The model is
+        # never modified after fit, so one instance can serve predictions from many threads
+        dataset = np.asarray(dataset, dtype=np.float64)
+        self.exact_features = dataset[:, :-1]
+        self.features = self.exact_features.astype(np.float32)
+        self.labels = dataset[:, -1]
+
+        # squared norms of the training rows, reused by every distance computation
+        self.squared_norms = np.einsum('ij,ij->i', self.features, self.features)
+        self.max_squared_norm = float(self.squared_norms.max()) if len(self.squared_norms) else 0.0
+        # class of every training row as an index into self.classes
+        self.classes, self.label_indexes = np.unique(self.labels, return_inverse=True)
+
+        self.tree = tree if tree is not None else self.build_index()
+        return self
+
+    def build_index(self):
+        # index libraries are only imported when an index is actually requested
+        if self.index == "kd_tree":
+            from scipy.spatial import cKDTree
+            return cKDTree(self.features)
+        elif self.index == "ball_tree":
+            from sklearn.neighbors import BallTree
+            return BallTree(self.features)
+        return None
+
+    def save(self, path):
+        # the training rows go to a plain float64 .npy file that can be memory-mapped on load,
+        # and the index, if any, is pickled next to it
+        temporary_path = get_temporary_path(path) + ".npy"
+        np.save(temporary_path, np.column_stack((self.exact_features, self.labels)))
+        os.replace(temporary_path, path)
+        self.save_index(path)
+
+    def save_index(self, path):
+        if self.tree is not None:
+            index_path = get_index_path(path, self.index)
+            temporary_path = get_temporary_path(index_path)
+            with open(temporary_path, 'wb') as index_file:
+                pickle.dump(self.tree, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, index_path)
+
+    @staticmethod
+    def load(path, k=12, index="brute"):
+        dataset = np.load(path, mmap_mode='r')
+
+        tree = None
+        if index != "brute" and is_current_index(path, index):
+            with open(get_index_path(path, index), 'rb') as index_file:
+                tree = pickle.load(index_file)
+
+        return KNNClassifier(k, index).fit(dataset, tree)
+
+    def to_matrix(self, instances, dtype=np.float32):
+        # instances may carry their class label as the last column (e.g. the test set), so only
+        # the feature columns are kept
+        instances = np.atleast_2d(np.asarray(instances, dtype=dtype))
+        return instances[:, :self.features.shape[1]]
+
+    def squared_distances(self, instances):
+        # |a - b|^2 = |a|^2 - 2ab + |b|^2, so distances to all training rows are one matrix product
+        instances = self.to_matrix(instances)
+        distances = instances @ self.features.T
+        distances *= -2
+        distances += np.einsum('ij,ij->i', instances, instances)[:, None]
+        distances += self.squared_norms[None, :]
+        # rounding can make distances of (almost) identical rows slightly negative
+        np.maximum(distances, 0, out=distances)
+        return distances
+
+    def get_neighbors(self, instances, k=None):
+        # returns indexes of the k nearest training rows for every instance, ordered by distance
+        k = min(k or self.k, len(self.features))
+        if self.tree is not None:
+            return self.query_index(instances, k)
+
+        distances = self.squared_distances(instances)
+        if k < distances.shape[1]:
+            # distance of the k-th nearest row, found by partial selection instead of a full sort. Every row
+            # within the rounding error of it may be one of the k nearest
+            kth_distance = np.partition(distances, k - 1, axis=1)[:, k - 1:k]
+            candidates = distances <= kth_distance + self.candidate_margin(instances)[:, None]
+        else:
+            candidates = np.ones(distances.shape, dtype=bool)
+        rows, columns = np.nonzero(candidates)
+        return self.nearest_candidates(instances, rows, columns, k)
+
+    def candidate_margin(self, instances):
+        # bound on the rounding error of the float32 squared distances of every instance
+        instances = self.to_matrix(instances)
+        return CANDIDATE_TOLERANCE * (np.einsum('ij,ij->i', instances, instances) + self.max_squared_norm)
+
+    def nearest_candidates(self, instances, rows, columns, k):
+        # the k nearest of the candidate training rows (columns) of every instance (rows, in increasing order),
+        # ranked by exact distance and equal distances by training row position, which is the order the
+        # stable sort in get_neighbors gives
+        instances = self.to_matrix(instances, np.float64)
+        distances = exact_distances(instances[rows], self.exact_features[columns])
+        order = np.lexsort((columns, distances, rows))
+        starts = np.searchsorted(rows[order], np.arange(len(instances)))
+        return columns[order][starts[:, None] + np.arange(k)]
+
+    def query_index(self, instances, k):
+        matrix = self.to_matrix(instances)
+        # one more neighbour than needed, to see whether another row is tied with the k-th one
+        if self.index == "kd_tree":
+            distances, indexes = self.tree.query(matrix, k=list(range(1, min(k + 1, len(self.features)) + 1)))
+        else:
+            distances, indexes = self.tree.query(matrix, k=min(k + 1, len(self.features)))
+        rows = np.repeat(np.arange(len(matrix)), k)
+        columns = indexes[:, :k].ravel()
+
+        # trees pick any of the rows tied at the k-th distance. Where another row is within the rounding error of
+        # it, every row within that error is a candidate, and the candidates are ranked exactly like the brute path
+        if distances.shape[1] > k:
+            margin = self.candidate_margin(matrix)
+            tied = np.nonzero(distances[:, k] ** 2 <= distances[:, k - 1] ** 2 + margin)[0]
+            if len(tied):
+                radius = np.sqrt(distances[tied, k - 1] ** 2 + margin[tied])
+                if self.index == "kd_tree":
+                    tied_columns = self.tree.query_ball_point(matrix[tied], radius)
+                else:
+                    tied_columns = self.tree.query_radius(matrix[tied], radius)
+                untied = np.ones(len(matrix), dtype=bool)
+                untied[tied] = False
+                rows = np.concatenate([np.repeat(np.nonzero(untied)[0], k)] +
+                                      [np.full(len(row_columns), row) for row, row_columns in zip(tied, tied_columns)])
+                columns = np.concatenate([indexes[untied, :k].ravel()] +
+                                         [np.asarray(row_columns, dtype=np.intp) for row_columns in tied_columns])
+                # nearest_candidates needs the candidates grouped by instance, in increasing order
+                order = np.argsort(rows, kind='stable')
+                rows, columns = rows[order], columns[order]
+        return self.nearest_candidates(instances, rows, columns, k)
+
+    def calculate_votes(self, neighbors):
+        # majority vote of the neighbours' classes for every instance; ties go to the class
+        # that appears first among the neighbours, the same as calculate_votes
+        neighbor_classes = self.label_indexes[neighbors]
+        matches = neighbor_classes[:, :, None] == np.arange(len(self.classes))
+        counts = matches.sum(axis=1)
+        first_seen = np.where(counts > 0, matches.argmax(axis=1), neighbors.shape[1])
+
+        scores = counts * (neighbors.shape[1] + 1) - first_seen
+        return self.classes[scores.argmax(axis=1)]
+
+    def predict(self, instances, k=None):
+        return self.calculate_votes(self.get_neighbors(instances, k))
+
+    def predict_proba(self, instances, k=None):
+        # share of the k nearest neighbours voting for each class (columns ordered as self.classes),
+        # along with the voted class
+        neighbors = self.get_neighbors(instances, k)
+        matches = self.label_indexes[neighbors][:, :, None] == np.arange(len(self.classes))
+        return matches.mean(axis=1), self.calculate_votes(neighbors)
+
+
+def get_index_path(path, index):
+    # the index is saved next to the training rows, e.g. files/datasetExtracted.npy.kd_tree
+    return path + "." + index
+
+
+def is_current_index(path, index):
+    index_path = get_index_path(path, index)
+    return os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(path)
+
+
+def get_temporary_path(path):
+    # files are written under a temporary name of the writing process and renamed, so other processes
+    # (batch.py or sweep.py workers) never map or unpickle a half written file
+    return "{}.{}.tmp".format(path, os.getpid())
+
+
+def get_model_path(data_set_path):
+    # binary copy of a csv dataset, e.g. files/datasetExtracted.npy
+    return os.path.splitext(data_set_path)[0] + ".npy"
+
+
+def is_exact_copy(model_path):
+    # copies saved before the training rows were kept in float64 lost their exact values
+    return np.load(model_path, mmap_mode='r').dtype == np.float64
+
+
+# process-wide cache of fitted models, keyed by dataset path and index backend
+_model_registry = {}
+_model_registry_lock = threading.Lock()
+
+
+def get_model(data_set_path, index="brute"):
+    # return the model fitted on the whole dataset, refitting it only if the csv changed on disk.
+    # The csv is parsed once; later loads, also in new processes, map the saved binary copy
+    key = (os.path.abspath(data_set_path), index)
+    mtime = os.path.getmtime(data_set_path)
+    with _model_registry_lock:
+        cached = _model_registry.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        model_path = get_model_path(data_set_path)
+        if os.path.exists(model_path) and os.path.getmtime(model_path) >= mtime and is_exact_copy(model_path):
+            model = KNNClassifier.load(model_path, index=index)
+            # load built the index if none was saved for this copy yet
+            if index != "brute" and not is_current_index(model_path, index):
+                model.save_index(model_path)
+        else:
+            training_set, test_set = load_dataset(data_set_path)
+            model = KNNClassifier(index=index).fit(training_set)
+            model.save(model_path)
+
+        _model_registry[key] = (mtime, model)
+        return model
+
+
+def evict_model(data_set_path=None):
+    # drop the cached models of one dataset, or all of them if no path is given
+    with _model_registry_lock:
+        if data_set_path is None:
+            _model_registry.clear()
+        else:
+            path = os.path.abspath(data_set_path)
+            for key in [key for key in _model_registry if key[0] == path]:
+                del _model_registry[key]
+
+
+def fit(to_predict, dataset, k, index="brute"):
+    predictions = KNNClassifier(k, index).fit(dataset).predict(to_predict).tolist()
+    for result in predictions:
         print('> predicted=' + repr(result))
 
     return predictions
 
 
-def predict(to_predict, data_set_path, k=12, training=False):
-    if len(training_set) == 0:
-        load_dataset(data_set_path, training)
+def predict(to_predict, data_set_path, k=12, training=False, index="brute"):
+    if training:
+        training_set, test_set = load_dataset(data_set_path, training)
 
-    # cross_validation()
+        # cross_validation(training_set)
 
-    if training:
-        predictions = fit(test_set, training_set, k)
+        predictions = fit(test_set, training_set, k, index)
         accuracy = calculate_accuracy(test_set, predictions)
         print('Accuracy: ' + repr(accuracy) + '%')
     else:
-        predictions = fit(to_predict, training_set, k)
+        predictions = get_model(data_set_path, index).predict(to_predict, k).tolist()
+        for result in predictions:
+            print('> predicted=' + repr(result))
 
     return predictions
 
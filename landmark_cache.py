@@ -0,0 +1,71 @@
+"""
+ On-disk cache of everything LieDetector extracts from the frames of a video: the face box, the 68 landmarks,
+ the average cheek color and the timestamp of every frame. Analysing a video again (e.g. with other thresholds)
+ replays the cache instead of decoding the video and running dlib on every frame.
+
+ A cache is one .npy file of FRAME_DTYPE records, loaded memory-mapped. It is keyed by the sha1 of the video's
+ contents and the face tracking settings, which change the landmarks that are found.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+CACHE_DIRECTORY = "cache"
+
+FRAME_DTYPE = np.dtype([
+    ("timestamp", np.float64),
+    # whether a face was found; the other fields are zero when it wasn't
+    ("face_found", np.bool_),
+    # left, top, right, bottom of the box the landmarks were predicted in
+    ("box", np.int32, (4,)),
+    ("landmarks", np.int16, (68, 2)),
+    # BGR, exactly as BlushingDetector computed it
+    ("cheeks_color", np.float64, (3,)),
+])
+
+
+def video_hash(video_path, chunk_size=2 ** 20):
+    sha1 = hashlib.sha1()
+    with open(video_path, "rb") as video_file:
+        for chunk in iter(lambda: video_file.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_cache_path(video_path, detection_interval=1, tracking="landmarks", detection_scale=1.0,
+                   directory=CACHE_DIRECTORY):
+    name = "{}_{}_i{}_s{:g}.npy".format(video_hash(video_path), tracking, detection_interval, detection_scale)
+    return os.path.join(directory, name)
+
+
+def load(cache_path):
+    return np.load(cache_path, mmap_mode="r")
+
+
+class LandmarkRecorder:
+    # collects the records of one video's frames while it is analysed, and writes them once the video ended
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.records = []
+
+    def append(self, timestamp, face, face_region, cheeks_color):
+        record = np.zeros((), dtype=FRAME_DTYPE)
+        record["timestamp"] = timestamp
+        if face_region is not None:
+            record["face_found"] = True
+            record["box"] = (face.left(), face.top(), face.right(), face.bottom())
+            record["landmarks"] = face_region
+            record["cheeks_color"] = cheeks_color[:3]
+        self.records.append(record)
+
+    def save(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # written under a temporary name and renamed, so a reader never maps a half written cache
+        temporary_path = self.cache_path + ".tmp.npy"
+        np.save(temporary_path, np.array(self.records, dtype=FRAME_DTYPE))
+        os.replace(temporary_path, self.cache_path)
+        print("[INFO] Saved landmarks of {} frames to {}".format(len(self.records), self.cache_path))
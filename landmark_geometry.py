@@ -0,0 +1,84 @@
+"""
+ Eye and lips geometry computed with NumPy over any number of frames at once. Every function takes landmarks shaped
+ (..., 68, 2), e.g. (68, 2) for one frame as the detectors get them, or (F, 68, 2) for F frames of a recording,
+ and returns one value per frame.
+"""
+import numpy as np
+
+# every pair of landmarks the features measure the distance between, as (first, second) indexes into
+# the 68 landmarks; all of them are measured with one vectorized operation
+LANDMARK_PAIRS = np.array([
+    # left eye: two heights and the width
+    (43, 47), (44, 46), (42, 45),
+    # right eye: two heights and the width
+    (37, 41), (38, 40), (36, 39),
+    # three heights of the top lip, then of the bottom lip
+    (50, 61), (51, 62), (52, 63), (56, 65), (57, 66), (58, 67),
+    # mouth width
+    (48, 54),
+    # middle points of the inner top and bottom lip, apart when the person is smiling
+    (62, 66),
+]).T
+LEFT_EYE_HEIGHTS, LEFT_EYE_WIDTH = slice(0, 2), 2
+RIGHT_EYE_HEIGHTS, RIGHT_EYE_WIDTH = slice(3, 5), 5
+LIPS_HEIGHTS, MOUTH_WIDTH, SMILE = slice(6, 12), 12, 13
+
+# lips aspect ratio reported for smiling frames, which never counts as pursed lips
+SMILE_LIPS_ASPECT_RATIO = 5
+SMILE_DISTANCE_THRESHOLD = 3
+
+
+def pair_distances(face_regions):
+    # euclidean distances of all LANDMARK_PAIRS, shaped (..., number of pairs)
+    face_regions = np.asarray(face_regions, dtype=np.float64)
+    difference = face_regions[..., LANDMARK_PAIRS[0], :] - face_regions[..., LANDMARK_PAIRS[1], :]
+    return np.sqrt((difference * difference).sum(axis=-1))
+
+
+def eye_aspect_ratio(eye):
+    # eye aspect ratio of (..., 6, 2) eye landmarks
+    eye = np.asarray(eye, dtype=np.float64)
+    difference = eye[..., [1, 2, 0], :] - eye[..., [5, 4, 3], :]
+    distances = np.sqrt((difference * difference).sum(axis=-1))
+    return (distances[..., 0] + distances[..., 1]) / (2.0 * distances[..., 2])
+
+
+def eye_aspect_ratios(face_regions, distances=None):
+    # average eye aspect ratio of both eyes
+    if distances is None:
+        distances = pair_distances(face_regions)
+    left_EAR = distances[..., LEFT_EYE_HEIGHTS].sum(axis=-1) / (2.0 * distances[..., LEFT_EYE_WIDTH])
+    right_EAR = distances[..., RIGHT_EYE_HEIGHTS].sum(axis=-1) / (2.0 * distances[..., RIGHT_EYE_WIDTH])
+    return (left_EAR + right_EAR) / 2.0
+
+
+def smile_distances(face_regions, distances=None):
+    if distances is None:
+        distances = pair_distances(face_regions)
+    return distances[..., SMILE]
+
+
+def lips_aspect_ratios(face_regions, consider_smile=False, distances=None):
+    # average thickness of the lips relative to the mouth width; with consider_smile, smiling frames
+    # (in which lips appear thinner then they are) get SMILE_LIPS_ASPECT_RATIO instead
+    if distances is None:
+        distances = pair_distances(face_regions)
+    LAR = distances[..., LIPS_HEIGHTS].sum(axis=-1) / (6.0 * distances[..., MOUTH_WIDTH])
+    if consider_smile:
+        LAR = np.where(distances[..., SMILE] > SMILE_DISTANCE_THRESHOLD, SMILE_LIPS_ASPECT_RATIO, LAR)
+    return LAR
+
+
+def calculate_features(face_regions, consider_smile=True):
+    # eye aspect ratio, lips aspect ratio and smile distance of every frame in one call
+    distances = pair_distances(face_regions)
+    return (eye_aspect_ratios(None, distances), lips_aspect_ratios(None, consider_smile, distances),
+            smile_distances(None, distances))
+
+
+def aspect_ratios(face_regions):
+    # eye aspect ratio, lips aspect ratio and lips aspect ratio with smiles (as PursedLipsDetector.detect uses it)
+    # of every face, from one measurement of the landmark pairs
+    distances = pair_distances(face_regions)
+    return (eye_aspect_ratios(None, distances), lips_aspect_ratios(None, False, distances),
+            lips_aspect_ratios(None, True, distances))
@@ -1,6 +1,50 @@
+import argparse
+
 import LieDetector
+import Pipeline
+import Profiler
+
+
+def print_score(score):
+    print("[INFO] {:.1f}s face {}: {} ({:.2f}), {} blinks, {} lip pursing, {} blushing in the last {:.1f}s".format(
+        score["time"], score["subject"], score["prediction"], score["probability"], score["blinks"],
+        score["lip_pursing"], score["blushing"], score["seconds"]))
+
 
 if __name__ == "__main__":
-    lieDetector = LieDetector.LieDetector(algorithm='ffnn')
-    lieDetector.process()
+    parser = argparse.ArgumentParser(description="Detect lies from blinking, lip pursing and blushing.")
+    parser.add_argument("--algorithm", choices=["knn", "ffnn"], default="ffnn")
+    parser.add_argument("--video", help="video file to analyse instead of the webcam")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="run capture, face detection and feature detection on separate threads")
+    parser.add_argument("--drop-policy", choices=Pipeline.DROP_POLICIES,
+                        help="what to do with frames the pipeline can't keep up with "
+                             "(default: drop_oldest for the webcam, block for files)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every stage of the frame loop and print the latencies at the end")
+    parser.add_argument("--metrics-file", help="keep the stage latencies, fps and dropped frames in this json file "
+                                               "(implies --profile)")
+    parser.add_argument("--metrics-port", type=int, help="serve the same metrics at http://127.0.0.1:PORT/metrics "
+                                                         "(implies --profile)")
+    parser.add_argument("--report", default=LieDetector.REPORT_PATH,
+                        help="report of every question, as JSON Lines, or in the legacy text layout for a .txt file")
+    parser.add_argument("--score-every", type=int, metavar="FRAMES",
+                        help="also predict continuously every this many frames, from the last --score-window seconds")
+    parser.add_argument("--score-window", type=float, default=10.0, metavar="SECONDS")
+    parser.add_argument("--max-faces", type=int, default=1,
+                        help="analyse up to this many faces, each with its own baseline, 0 analyses all of them")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile or args.metrics_file or args.metrics_port is not None:
+        profiler = Profiler.Profiler(args.metrics_file, args.metrics_port)
+
+    lieDetector = LieDetector.LieDetector(algorithm=args.algorithm, video_path=args.video, profiler=profiler,
+                                          report_path=args.report, score_every=args.score_every,
+                                          score_window=args.score_window, on_score=print_score,
+                                          max_faces=args.max_faces or None)
+    if args.pipeline:
+        Pipeline.Pipeline(lieDetector, drop_policy=args.drop_policy).process()
+    else:
+        lieDetector.process()
     lieDetector.destroy()
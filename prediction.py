@@ -0,0 +1,49 @@
+import numpy as np
+
+import feedforward_nn
+import kNN
+
+DATASET_PATH = feedforward_nn.DATASET_PATH
+MODEL_PATH = feedforward_nn.MODEL_PATH
+
+ALGORITHMS = ("knn", "ffnn")
+
+# class label of a truthful answer in the dataset
+TRUTH = 1
+
+
+def predict_batch(features, algorithm="knn", data_set_path=DATASET_PATH, model_path=MODEL_PATH, k=12,
+                  index="brute"):
+    # classify N questions at once. features is an (N, 4) array of average blinks, blinks per second,
+    # lip pursing and blushing per question. Returns the probability of each answer being truthful and the
+    # predicted labels (1 truth, 0 lie), both of length N
+    features = np.atleast_2d(np.asarray(features, dtype=np.float32))
+
+    if algorithm == "knn":
+        model = kNN.get_model(data_set_path, index)
+        votes, labels = model.predict_proba(features, k)
+        truth_column = np.flatnonzero(model.classes == TRUTH)
+        if len(truth_column):
+            probabilities = votes[:, truth_column[0]]
+        else:
+            probabilities = np.zeros(len(features))
+        return probabilities, labels.astype(int)
+
+    elif algorithm == "ffnn":
+        # one predict call for the whole batch instead of one per question
+        model = feedforward_nn.get_model(model_path)
+        probabilities = np.asarray(model.predict(features, batch_size=max(len(features), 1))).reshape(-1)
+        return probabilities, np.round(probabilities).astype(int)
+
+    raise ValueError("Unknown algorithm '" + algorithm + "', expected one of " + repr(ALGORITHMS))
+
+
+def to_answer(label):
+    return "truth" if label == TRUTH else "lie"
+
+
+def to_label(answer):
+    # class label of an answer given as "truth"/"lie" or as the label itself
+    if answer in ("truth", "lie"):
+        return TRUTH if answer == "truth" else 1 - TRUTH
+    return int(answer)
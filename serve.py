@@ -0,0 +1,66 @@
+"""
+ Analyses many streams at once in one process with a SessionServer, sharing the landmark predictor and prediction
+ models between them, and writes the per-question results of every stream to its own csv.
+
+ Streams are video files (or stream urls), with question end times from a json file like batch.py's, and cameras
+ by index. Press Ctrl+C to end live streams.
+
+ Run with: python serve.py ../dataset/01.mp4 ../dataset/02.mp4 --questions questions.json --workers 4
+           python serve.py --cameras 0 1
+"""
+import argparse
+import os
+
+import FaceTracker
+import SessionServer
+import batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse many streams in one process with shared models.")
+    parser.add_argument("videos", nargs="*", help="video files or stream urls")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[], help="indices of cameras to analyse")
+    parser.add_argument("--questions", help="json file with the end time of every question, per video file name")
+    parser.add_argument("--algorithm", choices=["knn", "ffnn"], default="knn")
+    parser.add_argument("--output", default="results", help="directory the per-question csv files are written to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="threads analysing frames, shared by all streams")
+    parser.add_argument("--detection-interval", type=int, default=1,
+                        help="run the face detector every this many frames and track the face in between")
+    parser.add_argument("--tracking", choices=FaceTracker.TRACKING_MODES, default="landmarks")
+    parser.add_argument("--detection-scale", type=float, default=1.0,
+                        help="detect faces on a frame this many times smaller (e.g. 2-4)")
+    parser.add_argument("--max-faces", type=int, default=1,
+                        help="analyse up to this many faces of every stream, 0 analyses all of them")
+    args = parser.parse_args()
+    if not args.videos and not args.cameras:
+        parser.error("give at least one video or camera")
+
+    question_times = batch.load_question_times(args.questions)
+    os.makedirs(args.output, exist_ok=True)
+
+    server = SessionServer.SessionServer(args.algorithm, args.workers, detection_interval=args.detection_interval,
+                                         tracking=args.tracking, detection_scale=args.detection_scale,
+                                         max_faces=args.max_faces or None)
+    names = {}
+    for video_path in args.videos:
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        names[name] = video_path
+        times = question_times.get(os.path.basename(video_path), question_times.get(video_path))
+        server.add_stream(name, video_path=video_path, question_times=times)
+    for camera in args.cameras:
+        name = "camera{}".format(camera)
+        names[name] = name
+        server.add_stream(name, camera=camera)
+
+    results = server.run()
+    for name, stream_results in results.items():
+        batch.write_results(stream_results, os.path.join(args.output, name + ".csv"))
+        print("[INFO] {}: {} questions, {} frames".format(names[name], len(stream_results),
+                                                         server.streams[name].frame_counter))
+    if server.errors:
+        raise SystemExit("[INFO] {} streams failed".format(len(server.errors)))
+
+
+if __name__ == "__main__":
+    main()
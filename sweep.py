@@ -0,0 +1,216 @@
+"""
+ Grid search over the hand-picked detection parameters. Every configuration of the grid is replayed over the landmark
+ caches of recorded sessions (videos without a cache are analysed once to create it), the features of every question
+ are classified with kNN and/or the feedforward network, and the configurations are ranked by accuracy and runtime.
+
+ The answers file maps video file names to the true answer of each of their questions, including the last one that
+ ends with the video, e.g. {"03.mp4": ["truth", "lie", "truth", "lie"]}. The grid file maps parameter names
+ (see PARAMETERS) to the values to try, e.g. {"blink_consecutive_frames": [1, 2, 3]}.
+
+ Run with: python sweep.py ../dataset/*.mp4 --questions questions.json --answers answers.json --grid grid.json
+"""
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import FaceTracker
+import LieDetector
+import batch
+import landmark_cache
+import prediction
+
+# every parameter the sweep can change, as the object of a LieDetector it belongs to (None for the LieDetector
+# itself) and the attribute it is stored in
+PARAMETERS = {
+    "frames_to_inspect": (None, "frames_to_inspect"),
+    "frames_to_inspect_eyes": (None, "frames_to_inspect_eyes"),
+    "eye_aspect_ratio_factor": ("blink_detector", "eye_aspect_ratio_factor"),
+    "blink_consecutive_frames": ("blink_detector", "blink_consecutive_frames"),
+    "eye_aspect_ratio_deviations": ("blink_detector", "eye_aspect_ratio_deviations"),
+    "lips_aspect_ratio_factor": ("pursed_lips_detector", "lips_aspect_ratio_factor"),
+    "pursed_lips_consecutive_frames": ("pursed_lips_detector", "pursed_lips_consecutive_frames"),
+    "lips_aspect_ratio_deviations": ("pursed_lips_detector", "lips_aspect_ratio_deviations"),
+    "blushing_consecutive_frames": ("blushing_detector", "BLUSHING_CONSECUTIVE_FRAMES"),
+    "red_change_allowance": ("blushing_detector", "RED_CHANGE_ALLOWANCE"),
+    "green_change_allowance": ("blushing_detector", "GREEN_CHANGE_ALLOWANCE"),
+    "blue_change_allowance": ("blushing_detector", "BLUE_CHANGE_ALLOWANCE"),
+    "rgb_change_allowance": ("blushing_detector", "RGB_CHANGE_ALLOWANCE"),
+}
+
+DEFAULT_GRID = {
+    "eye_aspect_ratio_factor": [0.6, 0.7, 0.8],
+    "blink_consecutive_frames": [1, 2, 3],
+    "pursed_lips_consecutive_frames": [2, 4, 6],
+    "blushing_consecutive_frames": [25, 50],
+}
+
+
+def configurations(grid):
+    for name in grid:
+        if name not in PARAMETERS:
+            raise ValueError("Unknown parameter '" + name + "', expected one of " + repr(sorted(PARAMETERS)))
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+
+def configure(lie_detector, configuration):
+    for name, value in configuration.items():
+        owner, attribute = PARAMETERS[name]
+        setattr(lie_detector if owner is None else getattr(lie_detector, owner), attribute, value)
+
+
+def session_features(cached_frames, question_times, configuration):
+    # features of every question of one recorded session, detected with the given parameters
+    lie_detector = LieDetector.LieDetector(None, question_times=question_times, display=False, report_path=None,
+                                           cached_frames=cached_frames)
+    configure(lie_detector, configuration)
+    lie_detector.process()
+    return lie_detector.question_features
+
+
+# sessions of a worker process, loaded once by its initializer: (video path, cached frames, question times, labels)
+_sessions = []
+# the detectors and models report every frame, question and load on stdout, which would drown the sweep's own
+# output, so their prints go here. Errors still reach stderr
+_devnull = None
+
+
+def _load_sessions(sessions, algorithms):
+    global _sessions, _devnull
+    _devnull = open(os.devnull, "w")
+    _sessions = [(video_path, landmark_cache.load(cache_path), question_times, labels)
+                 for video_path, cache_path, question_times, labels in sessions]
+    # load the models up front, so loading them isn't measured as the runtime of the first configuration
+    with contextlib.redirect_stdout(_devnull):
+        for algorithm in algorithms:
+            prediction.predict_batch(np.zeros((1, 4)), algorithm)
+
+
+def evaluate(configuration, algorithms):
+    start = time.perf_counter()
+    features, labels = [], []
+    for video_path, cached_frames, question_times, session_labels in _sessions:
+        with contextlib.redirect_stdout(_devnull):
+            video_features = session_features(cached_frames, question_times, configuration)
+        # every question of the session needs its answer, or the labels of all later sessions would be shifted
+        if len(video_features) != len(session_labels):
+            raise ValueError("{} has {} questions with {} but {} answers".format(
+                video_path, len(video_features), configuration, len(session_labels)))
+        features.extend(video_features)
+        labels.extend(session_labels)
+    feature_seconds = time.perf_counter() - start
+
+    result = dict(configuration, questions=len(features), feature_seconds=feature_seconds)
+    for algorithm in algorithms:
+        start = time.perf_counter()
+        _, predicted = prediction.predict_batch(features, algorithm)
+        result[algorithm + "_accuracy"] = float(np.mean(predicted == np.array(labels)))
+        result[algorithm + "_seconds"] = feature_seconds + time.perf_counter() - start
+    return result
+
+
+def ensure_caches(videos, question_times, cache_directory, detection_interval, tracking, detection_scale, workers):
+    # analyses the videos that weren't cached yet (with dlib, once) and returns the cache path of every video
+    cache_paths = [landmark_cache.get_cache_path(video_path, detection_interval, tracking, detection_scale,
+                                                 cache_directory) for video_path in videos]
+    missing = [(video_path, cache_path) for video_path, cache_path in zip(videos, cache_paths)
+               if not os.path.exists(cache_path)]
+    if missing:
+        print("[INFO] Caching the landmarks of {} videos".format(len(missing)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(batch.process_video, video_path, question_times.get(video_path), None,
+                                       detection_interval, tracking, detection_scale, cache_directory)
+                       for video_path, _ in missing]
+            for future in futures:
+                future.result()
+        for video_path, cache_path in missing:
+            if not os.path.exists(cache_path):
+                raise RuntimeError("Couldn't cache the landmarks of " + video_path)
+    return cache_paths
+
+
+def load_answers(answers_path, videos, question_times):
+    with open(answers_path, "r") as answers_file:
+        answers = json.load(answers_file)
+
+    labels = {}
+    for video_path in videos:
+        video_answers = answers.get(os.path.basename(video_path), answers.get(video_path))
+        if video_answers is None:
+            raise ValueError("No answers for " + video_path)
+        # the last question ends with the video, after the last question time
+        if len(video_answers) != len(question_times.get(video_path) or []) + 1:
+            raise ValueError("{} has {} answers for {} questions".format(
+                video_path, len(video_answers), len(question_times.get(video_path) or []) + 1))
+        labels[video_path] = [prediction.to_label(answer) for answer in video_answers]
+    return labels
+
+
+def rank(results, algorithm):
+    # most accurate first, the faster of equally accurate configurations first
+    return sorted(results, key=lambda result: (-result[algorithm + "_accuracy"], result[algorithm + "_seconds"]))
+
+
+def write_results(results, output_path):
+    with open(output_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank detection parameters by prediction accuracy and runtime.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--questions", help="json file with the end time of every question, per video file name")
+    parser.add_argument("--answers", required=True, help="json file with the true answers, per video file name")
+    parser.add_argument("--grid", help="json file with the values of every parameter to try")
+    parser.add_argument("--algorithms", nargs="+", choices=prediction.ALGORITHMS, default=list(prediction.ALGORITHMS))
+    parser.add_argument("--landmark-cache", metavar="DIRECTORY", default=landmark_cache.CACHE_DIRECTORY)
+    parser.add_argument("--output", default="sweep.csv", help="csv file every configuration's results are written to")
+    parser.add_argument("--top", type=int, default=10, help="number of best configurations to print per algorithm")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--detection-interval", type=int, default=1)
+    parser.add_argument("--tracking", choices=FaceTracker.TRACKING_MODES, default="landmarks")
+    parser.add_argument("--detection-scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    question_times = batch.load_question_times(args.questions)
+    question_times = {video_path: question_times.get(os.path.basename(video_path), question_times.get(video_path))
+                      for video_path in args.videos}
+    labels = load_answers(args.answers, args.videos, question_times)
+    grid = DEFAULT_GRID
+    if args.grid is not None:
+        with open(args.grid, "r") as grid_file:
+            grid = json.load(grid_file)
+    grid_configurations = configurations(grid)
+
+    cache_paths = ensure_caches(args.videos, question_times, args.landmark_cache, args.detection_interval,
+                                args.tracking, args.detection_scale, args.workers)
+    sessions = [(video_path, cache_path, question_times[video_path], labels[video_path])
+                for video_path, cache_path in zip(args.videos, cache_paths)]
+
+    print("[INFO] Evaluating {} configurations over {} sessions".format(len(grid_configurations), len(sessions)))
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_load_sessions,
+                             initargs=(sessions, args.algorithms)) as executor:
+        results = list(executor.map(evaluate, grid_configurations, itertools.repeat(args.algorithms)))
+    print("[INFO] Swept {} configurations in {:.1f}s".format(len(results), time.time() - start))
+
+    write_results(results, args.output)
+    for algorithm in args.algorithms:
+        print("\nBest configurations for " + algorithm + ":")
+        for result in rank(results, algorithm)[:args.top]:
+            print("  accuracy {:.3f}  {:.3f}s  {}".format(
+                result[algorithm + "_accuracy"], result[algorithm + "_seconds"],
+                ", ".join("{}={}".format(name, result[name]) for name in grid)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import feedforward_nn
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, feedforward_nn.MODEL_PATH)
+
+
+@pytest.fixture
+def model_copy(tmp_path):
+    # the saved model and its numpy export, copied so they can be changed
+    for extension in (".json", ".h5", ".npz"):
+        shutil.copy(MODEL_PATH + extension, str(tmp_path / ("model" + extension)))
+    yield str(tmp_path / "model")
+    feedforward_nn.evict_model(str(tmp_path / "model"))
+
+
+def test_numpy_model_matches_keras():
+    pytest.importorskip("keras")
+    keras = feedforward_nn.import_keras()
+    if int(keras.__version__.split(".")[0]) >= 3:
+        pytest.skip("model.json was saved by keras 2, which keras {} can't load without tf_keras".format(
+            keras.__version__))
+
+    assert feedforward_nn.check_parity(MODEL_PATH) <= 1e-5
+
+
+def test_saved_numpy_model_is_current():
+    assert feedforward_nn._numpy_model_is_current(MODEL_PATH)
+
+
+def test_numpy_model_is_used_whatever_the_file_times(model_copy):
+    # a clone or checkout can write model.npz before model.h5
+    os.utime(model_copy + ".npz", (0, 0))
+    assert isinstance(feedforward_nn.get_model(model_copy), feedforward_nn.NumpyModel)
+
+
+def test_numpy_model_is_stale_when_the_weights_change(model_copy):
+    with open(model_copy + ".h5", "ab") as weights_file:
+        weights_file.write(b"\0")
+    assert not feedforward_nn._numpy_model_is_current(model_copy)
+
+
+def test_numpy_model_without_hash_is_stale(model_copy):
+    with np.load(model_copy + ".npz") as arrays:
+        arrays = {name: arrays[name] for name in arrays.files if name != "source_hash"}
+    np.savez(model_copy, **arrays)
+    assert not feedforward_nn._numpy_model_is_current(model_copy)
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+import kNN
+
+
+def leave_one_out_accuracies(dataset):
+    # the loop cross_validation replaced: every row classified by get_neighbors and calculate_votes
+    # on all the other rows, for every k
+    accuracies = {}
+    for k in range(1, len(dataset) - 1):
+        correct = 0
+        for i, row in enumerate(dataset):
+            others = dataset[:i] + dataset[i + 1:]
+            if kNN.calculate_votes(kNN.get_neighbors(others, row, k)) == row[-1]:
+                correct += 1
+        accuracies[k] = correct / float(len(dataset)) * 100.0
+    return accuracies
+
+
+def tied_dataset(seed, size=25):
+    # features with one decimal in [0, 5], so many rows are exactly as far from each other, and no duplicate rows
+    generator = random.Random(seed)
+    rows = set()
+    while len(rows) < size:
+        rows.add(tuple(round(generator.uniform(0, 5), 1) for _ in range(4)))
+    return [list(row) + [float(generator.randint(0, 1))] for row in rows]
+
+
+# seeds 4, 8, 32 and 44 ordered tied neighbours differently when distances were computed in float32
+@pytest.mark.parametrize("seed", [0, 1, 2, 3, 4, 8, 32, 44])
+def test_cross_validation_matches_leave_one_out_loop(seed):
+    dataset = tied_dataset(seed)
+    expected = leave_one_out_accuracies(dataset)
+
+    accuracies = kNN.cross_validation(dataset, n_jobs=1)
+
+    assert accuracies == pytest.approx(expected)
+
+
+# seeds 21, 32 and 55 ordered exactly tied neighbours differently when they were ranked by float32 distances,
+# and the trees picked other rows tied at the k-th distance for seeds 17, 21 and 55
+@pytest.mark.parametrize("index", kNN.INDEX_BACKENDS)
+@pytest.mark.parametrize("seed", [17, 21, 32, 55])
+def test_neighbors_match_get_neighbors_loop(seed, index):
+    dataset = tied_dataset(seed, size=40)
+    queries = tied_dataset(seed + 1000, size=20)
+    model = kNN.KNNClassifier(index=index).fit(dataset)
+
+    for k in (1, 3, 5, 12):
+        neighbors = model.get_neighbors(queries, k)
+        for query, query_neighbors in zip(queries, neighbors):
+            expected = kNN.get_neighbors(dataset, query, k)
+            assert [dataset[i] for i in query_neighbors] == expected
+        assert model.predict(queries, k).tolist() == [kNN.calculate_votes(kNN.get_neighbors(dataset, query, k))
+                                                      for query in queries]
@@ -0,0 +1,30 @@
+import types
+
+import Profiler
+import StreamingScorer
+
+
+def test_window_drops_frames_that_left_it():
+    window = StreamingScorer.RollingCounts(10.0, 601)
+    for time in range(20):
+        window.add(float(time), (1, 0, 0))
+
+    assert window.totals == [10, 0, 0]
+    assert window.size == 10
+
+
+def test_score_after_a_gap_forgets_old_events():
+    # a subject whose face was lost gets no new frames, its old events must still leave the window
+    subject = types.SimpleNamespace(person=types.SimpleNamespace(average_number_of_blinks=0.5))
+    session = types.SimpleNamespace(subjects={0: subject}, profiler=Profiler.NullProfiler(), algorithm=None,
+                                    frame_counter=0)
+    scorer = StreamingScorer.StreamingScorer(session, window_seconds=10.0)
+    window = scorer.windows[0] = StreamingScorer.RollingCounts(10.0, scorer.capacity)
+    for time in (0.0, 1.0, 2.0):
+        window.add(time, (1, 0, 0))
+
+    score, = scorer.score(62.0)
+
+    assert score["blinks"] == 0
+    assert score["blinks_per_second"] == 0
+    assert score["seconds"] == 10.0